@@ -1,27 +1,83 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from config import settings
-from database import get_db
-from models import User
+from database import get_read_db
+from jwt_backends import TokenError, jwt_backend
+from metrics import track
+from passwords import get_password_hash, verify_password
+from repository import fetch_user_by_email
 from schemas import TokenData
+from token_cache import CachedUser, token_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+_admin_emails = frozenset(
+    email.strip().lower() for email in (settings.admin_emails or "").split(",") if email.strip()
+)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+_password_pool: Optional[ProcessPoolExecutor] = None
+_password_pending = 0
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    if _password_pool is None:
+        _password_pool = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+    return _password_pool
+
+
+def start_password_pool():
+    """Start the bcrypt workers up front, before the server has spun up its threads"""
+    if settings.password_hash_workers > 0:
+        get_password_pool().submit(int).result()
+
+
+def shutdown_password_pool():
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=True, cancel_futures=True)
+        _password_pool = None
+
+
+async def _run_password_operation(fn, *args):
+    """Run a bcrypt operation off the event loop, rejecting work beyond the queue limit"""
+    global _password_pending
+    if _password_pending >= settings.password_hash_max_pending:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _password_pending += 1
+    try:
+        with track("bcrypt"):
+            if settings.password_hash_workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(get_password_pool(), fn, *args)
+    except BrokenProcessPool:
+        # A worker died, start a fresh pool for the next request
+        shutdown_password_pool()
+        raise
+    finally:
+        _password_pending -= 1
+
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_password_operation(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password):
+    return await _run_password_operation(get_password_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -31,30 +87,53 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    with track("jwt"):
+        encoded_jwt = jwt_backend.encode(to_encode)
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> dict:
+    """Claims of a validly signed, unexpired token, raises TokenError otherwise"""
+    with track("jwt"):
+        return jwt_backend.decode(token)
+
+
 def verify_token(token: str, credentials_exception):
     try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(email=email, exp=payload.get("exp"))
         return token_data
-    except JWTError:
+    except TokenError:
         raise credentials_exception
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)) -> CachedUser:
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     token_data = verify_token(token, credentials_exception)
-    user = db.query(User).filter(User.email == token_data.email).first()
+    user = await fetch_user_by_email(db, token_data.email)
     if user is None:
         raise credentials_exception
-    return user
+
+    current_user = CachedUser.from_user(user)
+    token_cache.set(token, token_data.exp, current_user)
+    return current_user
+
+
+async def get_admin_user(current_user: CachedUser = Depends(get_current_user)) -> CachedUser:
+    if current_user.email.lower() not in _admin_emails:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
@@ -0,0 +1,75 @@
+"""
+Shared helpers for the benchmark scripts
+
+Run benchmarks from the project directory, e.g. ``python -m benchmarks.random_user``.
+"""
+
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+# Benchmarks use throwaway databases, so placeholder settings are enough when
+# no .env file is present.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("HOST", "127.0.0.1")
+os.environ.setdefault("PORT", "8000")
+os.environ.setdefault("DEBUG", "false")
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+from models import Base, User  # noqa: E402
+
+# Placeholder password hash, users seeded here never log in
+PASSWORD_HASH = "$2b$12$" + "x" * 53
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds for samples measured in seconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+def measure(fn: Callable[[], object], iterations: int) -> Dict[str, float]:
+    """Call fn repeatedly and summarize the per-call latency"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def sqlite_engine(path: str):
+    """Create a fresh SQLite database with the application schema"""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def seed_users(engine, start: int, stop: int, batch_size: int = 50_000):
+    """Insert users numbered start..stop-1 with executemany batches"""
+    with engine.begin() as conn:
+        for batch_start in range(start, stop, batch_size):
+            batch_stop = min(batch_start + batch_size, stop)
+            conn.execute(insert(User), [
+                {"name": f"User {i}", "email": f"user{i}@example.com", "password": PASSWORD_HASH}
+                for i in range(batch_start, batch_stop)
+            ])
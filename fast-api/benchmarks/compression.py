@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark response compression of post listings
+
+Builds /random style payloads from mock markdown posts, with full bodies and
+with the default excerpts, and reports the bytes on the wire and the CPU
+time spent compressing one response for every encoding and level.
+
+    python -m benchmarks.compression --posts 50
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+import orjson
+
+from benchmarks.common import summarize
+from compression import _brotli, _gzip, _zstd
+from generate_mock_data_auto import POST_CATEGORIES, ContentPool
+
+LEVELS = {
+    "gzip": (_gzip, (1, 6, 9)),
+    "br": (_brotli, (1, 4, 6, 11)),
+    "zstd": (_zstd, (1, 3, 9)),
+}
+
+
+def build_payload(pool, rng, posts: int, excerpt_length=None) -> bytes:
+    items = []
+    for i in range(posts):
+        title, content = pool.post(rng, rng.choice(POST_CATEGORIES))
+        post = {"id": i + 1, "user_id": 1, "title": title, "content": content,
+                "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 1)}
+        if excerpt_length is not None:
+            post["excerpt"] = post.pop("content")[:excerpt_length]
+        items.append(post)
+    return orjson.dumps({"random_number": 1, "user": {"id": 1, "name": "User", "email": "user@example.com"},
+                         "jwt_token": "x" * 150, "posts": items})
+
+
+def cpu_per_call(fn, body, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.process_time()
+        fn(body)
+        samples.append(time.process_time() - start)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--excerpt-length", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    pool = ContentPool(args.seed, size=100)
+    payloads = {
+        "full": build_payload(pool, random.Random(args.seed), args.posts),
+        "excerpts": build_payload(pool, random.Random(args.seed), args.posts, args.excerpt_length),
+    }
+
+    results = {}
+    for name, body in payloads.items():
+        rows = {"identity": {"bytes": len(body)}}
+        for encoding, (factory, levels) in LEVELS.items():
+            try:
+                compressors = {level: factory(level) for level in levels}
+            except RuntimeError as e:
+                rows[encoding] = str(e)
+                continue
+            for level, compress in compressors.items():
+                compressed = compress(body)
+                cpu = cpu_per_call(compress, body, args.iterations)
+                rows[f"{encoding}-{level}"] = {
+                    "bytes": len(compressed),
+                    "ratio": len(body) / len(compressed),
+                    "cpu_ms_mean": cpu["mean_ms"],
+                    "cpu_ms_p95": cpu["p95_ms"],
+                }
+        results[name] = rows
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
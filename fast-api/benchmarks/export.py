@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark NDJSON post exports, buffered vs streamed
+
+Exports every post of a seeded database twice: loading all rows with
+.all() and encoding them in one go, as a regular endpoint would, and
+through the streaming export, which reads EXPORT_BATCH_SIZE rows per round
+trip and encodes them as they arrive. Reports rows/sec and the peak Python
+memory of each (tracemalloc, so the numbers include its overhead).
+
+    python -m benchmarks.export --posts 200000
+    DATABASE_ASYNC=true python -m benchmarks.export --batch-size 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=100, help="Users the posts are spread over")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per round trip when streaming")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so the database and batch size have
+    # to be configured before any application module is imported.
+    path = os.path.join(tempfile.gettempdir(), "bench_export.db")
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["EXPORT_BATCH_SIZE"] = str(args.batch_size)
+
+    import orjson
+    from sqlalchemy import insert
+
+    from benchmarks.common import seed_users
+    from database import engine, open_primary_session
+    from export import EXPORT_FIELDS, export_query, ndjson_lines
+    from migrate import upgrade_database
+    from models import Post
+
+    upgrade_database()
+    seed_users(engine, 0, args.users)
+    with engine.begin() as conn:
+        for start in range(0, args.posts, 50_000):
+            conn.execute(insert(Post), [
+                {"user_id": i % args.users + 1, "title": f"Post {i}", "content": "lorem ipsum " * 40}
+                for i in range(start, min(start + 50_000, args.posts))
+            ])
+
+    query = export_query(EXPORT_FIELDS)
+
+    async def buffered():
+        db = open_primary_session()
+        try:
+            rows = (await db.execute(query)).mappings().all()
+            body = b"".join(orjson.dumps(dict(row)) + b"\n" for row in rows)
+            return len(rows), len(body)
+        finally:
+            await db.close()
+
+    async def streamed():
+        size = 0
+        async for chunk in ndjson_lines(open_primary_session(), query, "benchmark"):
+            size += len(chunk)
+        return args.posts, size
+
+    async def run(export):
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows, size = await export()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            "rows": rows,
+            "bytes": size,
+            "seconds": elapsed,
+            "rows_per_sec": rows / elapsed,
+            "peak_memory_mb": peak / 1024 / 1024,
+        }
+
+    async def run_all():
+        results = {"posts": args.posts, "batch_size": args.batch_size}
+        for name, export in (("buffered", buffered), ("streamed", streamed)):
+            results[name] = await run(export)
+        return results
+
+    print(json.dumps(asyncio.run(run_all()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
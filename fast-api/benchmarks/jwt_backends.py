@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the JWT backends
+
+Reports encode and verify operations per second for every backend and
+checks that tokens issued by each backend are accepted by the others.
+
+    python -m benchmarks.jwt_backends --algorithm HS256 --iterations 20000
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import common  # noqa: F401  placeholder settings
+from jwt_backends import HMACJWTBackend, JoseJWTBackend
+
+BACKENDS = {
+    "jose": JoseJWTBackend,
+    "hmac": HMACJWTBackend,
+}
+
+
+def ops_per_second(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--algorithm", default="HS256")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    secret = "benchmark-secret-" + "x" * 32
+    backends = {name: cls(secret, args.algorithm) for name, cls in BACKENDS.items()}
+    claims = {"sub": "user1@example.com", "exp": datetime.utcnow() + timedelta(minutes=30)}
+    tokens = {name: backend.encode(claims) for name, backend in backends.items()}
+
+    # Wire compatibility in both directions
+    for issuer, token in tokens.items():
+        for name, backend in backends.items():
+            decoded = backend.decode(token)
+            assert decoded["sub"] == claims["sub"], (issuer, name)
+
+    results = {"algorithm": args.algorithm, "iterations": args.iterations}
+    for name, backend in backends.items():
+        results[name] = {
+            "encode_ops_per_s": ops_per_second(lambda: backend.encode(claims), args.iterations),
+            "verify_ops_per_s": ops_per_second(lambda: backend.decode(tokens[name]), args.iterations),
+        }
+
+    for op in ("encode_ops_per_s", "verify_ops_per_s"):
+        results[f"{op.split('_')[0]}_speedup"] = results["hmac"][op] / results["jose"][op]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the API endpoints
+
+Drives a weighted mix of /token, /random, /users/me and /users/me/posts
+requests from many concurrent clients and reports requests/sec plus latency
+percentiles and histograms per endpoint as JSON.
+
+Against a running server:
+
+    python -m benchmarks.load --url http://localhost:8000 --duration 30
+
+In-process against a freshly seeded SQLite (or --database-url) fixture:
+
+    python -m benchmarks.load --seed-users 1000 --mix random=1,me=4,posts=4
+
+Save a run with --output and compare later runs with --baseline; the exit
+status is 1 when p95 latency or throughput regress by more than
+--max-regression.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+# Mock data generator password shared by every seeded user
+PASSWORD = "password123"
+
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+DEFAULT_MIX = "token=1,random=2,me=5,posts=5"
+
+
+async def _token(client, identity, rng):
+    email, _ = rng.choice(identity)
+    return await client.post("/token", data={"username": email, "password": PASSWORD})
+
+
+async def _random(client, identity, rng):
+    return await client.get("/random")
+
+
+async def _me(client, identity, rng):
+    _, token = rng.choice(identity)
+    return await client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+
+
+async def _posts(client, identity, rng):
+    _, token = rng.choice(identity)
+    return await client.get("/users/me/posts", headers={"Authorization": f"Bearer {token}"})
+
+
+SCENARIOS = {
+    "token": _token,
+    "random": _random,
+    "me": _me,
+    "posts": _posts,
+}
+
+
+def parse_mix(mix: str):
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def histogram(samples):
+    counts = {f"<={bound}": 0 for bound in HISTOGRAM_BUCKETS_MS}
+    counts[f">{HISTOGRAM_BUCKETS_MS[-1]}"] = 0
+    for sample in samples:
+        ms = sample * 1000
+        for bound in HISTOGRAM_BUCKETS_MS:
+            if ms <= bound:
+                counts[f"<={bound}"] += 1
+                break
+        else:
+            counts[f">{HISTOGRAM_BUCKETS_MS[-1]}"] += 1
+    return counts
+
+
+async def collect_identities(client, count):
+    """Email and access token pairs of users picked through /random"""
+    identities = {}
+    for _ in range(count * 3):
+        response = await client.get("/random")
+        response.raise_for_status()
+        data = response.json()
+        identities[data["user"]["email"]] = data["jwt_token"]
+        if len(identities) >= count:
+            break
+    return list(identities.items())
+
+
+async def run_load(base_url, weights, concurrency, duration, warmup, identities_count, seed):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        identity = await collect_identities(client, identities_count)
+
+        names = list(weights)
+        scenario_weights = list(weights.values())
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        measuring = False
+
+        async def worker(worker_id):
+            rng = random.Random(seed + worker_id)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights=scenario_weights)[0]
+                start = time.perf_counter()
+                try:
+                    response = await SCENARIOS[name](client, identity, rng)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                finished = time.perf_counter()
+                elapsed = finished - start
+
+                # Only requests completed inside the measured window count
+                if not measuring or finished > deadline:
+                    continue
+                if failed:
+                    errors[name] += 1
+                else:
+                    latencies[name].append(elapsed)
+
+        deadline = time.perf_counter() + warmup + duration
+        tasks = [asyncio.create_task(worker(i)) for i in range(concurrency)]
+        await asyncio.sleep(warmup)
+        measuring = True
+        await asyncio.gather(*tasks)
+
+    return latencies, errors, duration
+
+
+def build_report(latencies, errors, elapsed, config):
+    from benchmarks.common import summarize
+
+    endpoints = {}
+    total = total_errors = 0
+    for name in sorted(set(latencies) | set(errors)):
+        samples = latencies.get(name, [])
+        total += len(samples)
+        total_errors += errors.get(name, 0)
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": errors.get(name, 0),
+            "rps": len(samples) / elapsed,
+            "latency_ms": summarize(samples) if samples else None,
+            "histogram_ms": histogram(samples),
+        }
+
+    return {
+        "config": config,
+        "duration_s": elapsed,
+        "total": {"requests": total, "errors": total_errors, "rps": total / elapsed},
+        "endpoints": endpoints,
+    }
+
+
+def compare(report, baseline, max_regression):
+    """Print the change against a baseline report, returning False on a regression"""
+    ok = True
+    print("\nComparison with baseline:", file=sys.stderr)
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous or not previous.get("latency_ms") or not current.get("latency_ms"):
+            continue
+
+        rps_change = current["rps"] / previous["rps"] - 1
+        p95_change = current["latency_ms"]["p95_ms"] / previous["latency_ms"]["p95_ms"] - 1
+        regressed = rps_change < -max_regression or p95_change > max_regression
+        ok = ok and not regressed
+        print(f"  {name:>7}: rps {rps_change:+7.1%}  p95 {p95_change:+7.1%}"
+              f"{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+    return ok
+
+
+class _ThreadedServer:
+    """Runs the application with uvicorn in a background thread"""
+
+    def __init__(self, port):
+        import uvicorn
+
+        class Server(uvicorn.Server):
+            def install_signal_handlers(self):
+                pass
+
+        self.server = Server(uvicorn.Config("main:app", host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise SystemExit("The application failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the API endpoints")
+    parser.add_argument("--url", help="Base URL of a running server, the app runs in-process when omitted")
+    parser.add_argument("--database-url", help="Database for the in-process app (default: temporary SQLite file)")
+    parser.add_argument("--seed-users", type=int, default=0,
+                        help="Seed the in-process database with this many users using the bulk mock generator")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before measuring")
+    parser.add_argument("--identities", type=int, default=50, help="Distinct users to authenticate as")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="Allowed relative p95/throughput regression against the baseline")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+
+    if args.url:
+        latencies, errors, elapsed = asyncio.run(run_load(
+            args.url, weights, args.concurrency, args.duration, args.warmup, args.identities, args.seed
+        ))
+    else:
+        # Settings are read at import time, so the fixture database has to be
+        # configured before any application module is imported.
+        os.environ["DATABASE_URL"] = args.database_url or (
+            f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_load.db')}"
+        )
+
+        import benchmarks.common  # noqa: F401  placeholder settings
+        from migrate import upgrade_database
+
+        upgrade_database()
+        if args.seed_users:
+            from generate_mock_data_auto import generate_mock_data_bulk
+            generate_mock_data_bulk(args.seed_users, seed=args.seed)
+
+        port = _free_port()
+        with _ThreadedServer(port):
+            latencies, errors, elapsed = asyncio.run(run_load(
+                f"http://127.0.0.1:{port}", weights, args.concurrency, args.duration,
+                args.warmup, args.identities, args.seed
+            ))
+
+    report = build_report(latencies, errors, elapsed, config)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark random user selection for /random against growing users tables
+
+Compares the previous "load every user and random.choice" approach with the
+cached id index used by the endpoint now. The indexed pick should stay flat
+from 100 to 1M users.
+
+    python -m benchmarks.random_user --sizes 100 10000 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import measure, seed_users, sqlite_engine
+from database import ThreadedSession
+from models import User
+from user_index import UserIdIndex
+
+
+def legacy_pick(db):
+    users = db.query(User).all()
+    return random.choice(users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--legacy-max-users", type=int, default=100_000,
+                        help="Skip the legacy approach above this many users, it gets very slow")
+    parser.add_argument("--db-path", default=os.path.join(tempfile.gettempdir(), "bench_random_user.db"))
+    args = parser.parse_args()
+
+    engine = sqlite_engine(args.db_path)
+    Session = sessionmaker(bind=engine)
+    # The index is used from the event loop with the request's session, like the endpoint does
+    loop = asyncio.new_event_loop()
+    results = []
+    seeded = 0
+
+    for size in sorted(args.sizes):
+        seed_users(engine, seeded, size)
+        seeded = size
+
+        index = UserIdIndex(refresh_seconds=float("inf"))
+        with Session() as db:
+            start = time.perf_counter()
+            loop.run_until_complete(index.refresh(ThreadedSession(db), None))
+            refresh_ms = (time.perf_counter() - start) * 1000
+
+        def indexed():
+            with Session() as db:
+                loop.run_until_complete(index.pick(ThreadedSession(db)))
+
+        row = {"users": size, "index_refresh_ms": refresh_ms, "indexed": measure(indexed, args.iterations)}
+
+        if size <= args.legacy_max_users:
+            def legacy():
+                with Session() as db:
+                    legacy_pick(db)
+
+            row["legacy"] = measure(legacy, max(1, min(args.iterations, 2_000_000 // size)))
+
+        results.append(row)
+        legacy_ms = row["legacy"]["p50_ms"] if "legacy" in row else float("nan")
+        print(f"{size:>9} users  indexed p50 {row['indexed']['p50_ms']:8.3f} ms  "
+              f"legacy p50 {legacy_ms:10.3f} ms  index refresh {refresh_ms:8.1f} ms")
+
+    loop.close()
+    engine.dispose()
+    os.remove(args.db_path)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
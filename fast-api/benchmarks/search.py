@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-text search queries
+
+Runs the /posts/search query for a set of search terms, across all posts and
+within one user's posts, and reports latency percentiles and match counts per
+term. Seeds a temporary SQLite database with the bulk mock generator unless
+--database-url points at an existing dataset.
+
+    python -m benchmarks.search --seed-users 2000
+    python -m benchmarks.search --database-url postgresql://... --seed-users 0
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+from sqlalchemy import func, select
+
+DEFAULT_TERMS = ["docker", "testing best practices", "cloud computing architecture", "security", "xylophone"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="Database to search (default: temporary SQLite file)")
+    parser.add_argument("--seed-users", type=int, default=1000,
+                        help="Seed the database with this many users first, 0 to search the existing data")
+    parser.add_argument("--terms", nargs="+", default=DEFAULT_TERMS)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Settings are read at import time, so the database has to be configured
+    # before any application module is imported.
+    os.environ["DATABASE_URL"] = args.database_url or (
+        f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_search.db')}"
+    )
+
+    from benchmarks.common import measure
+    from database import engine
+    from migrate import upgrade_database
+    from models import Post
+    from pagination import SUMMARY_FIELDS, post_columns
+    from search import search_posts
+
+    upgrade_database()
+    if args.seed_users:
+        from generate_mock_data_auto import generate_mock_data_bulk
+        # Progress goes to stderr, stdout is the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_mock_data_bulk(args.seed_users, seed=args.seed)
+
+    columns = post_columns(SUMMARY_FIELDS)
+    results = {"dialect": engine.dialect.name, "terms": {}}
+    with engine.connect() as conn:
+        results["posts"] = conn.execute(select(func.count()).select_from(Post)).scalar()
+        user_id = conn.execute(select(func.min(Post.user_id))).scalar()
+
+        for term in args.terms:
+            every_user = search_posts(term, columns, engine.dialect.name, args.limit)
+            one_user = search_posts(term, columns, engine.dialect.name, args.limit, user_id=user_id)
+            matches = conn.execute(
+                select(func.count()).select_from(search_posts(term, [Post.id], engine.dialect.name, None).subquery())
+            ).scalar()
+            results["terms"][term] = {
+                "matches": matches,
+                "all_posts": measure(lambda: conn.execute(every_user).all(), args.iterations),
+                "one_user": measure(lambda: conn.execute(one_user).all(), args.iterations),
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark hydrating and encoding a user's posts for the read endpoints
+
+Compares the previous path (load Post instances, run FastAPI's
+jsonable_encoder, encode with the stdlib json module) with the current one
+(select the columns as row mappings and encode with orjson), both with full
+post bodies and with the default summary fields, which replace the content
+by an excerpt. Hydrate and encode times and the response size are reported
+per request.
+
+    python -m benchmarks.serialization --posts 50 --content-size 2000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker, undefer
+
+from benchmarks.common import measure, seed_users, sqlite_engine
+from models import Post
+from pagination import SUMMARY_FIELDS, post_columns
+from responses import ORJSONResponse
+
+# Fields the endpoints returned before content was deferred
+FULL_FIELDS = ("id", "user_id", "title", "content", "created_at", "updated_at")
+
+
+def seed_posts(engine, user_id: int, count: int, content_size: int):
+    with engine.begin() as conn:
+        conn.execute(insert(Post), [
+            {"user_id": user_id, "title": f"Post {i}", "content": "x" * content_size}
+            for i in range(count)
+        ])
+
+
+def orm_hydrate(db, user_id):
+    return db.scalars(select(Post).where(Post.user_id == user_id).options(undefer(Post.content))).all()
+
+
+def orm_encode(posts):
+    return JSONResponse(jsonable_encoder(posts)).body
+
+
+def rows_hydrate(fields):
+    def hydrate(db, user_id):
+        query = select(*post_columns(fields)).where(Post.user_id == user_id)
+        return [dict(row) for row in db.execute(query).mappings()]
+    return hydrate
+
+
+def rows_encode(posts):
+    return ORJSONResponse(posts).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=50)
+    parser.add_argument("--content-size", type=int, default=2000, help="Characters of content per post")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--db-path", default=os.path.join(tempfile.gettempdir(), "bench_serialization.db"))
+    args = parser.parse_args()
+
+    engine = sqlite_engine(args.db_path)
+    seed_users(engine, 0, 1)
+    seed_posts(engine, 1, args.posts, args.content_size)
+    Session = sessionmaker(bind=engine)
+
+    results = {"posts": args.posts, "content_size": args.content_size}
+    paths = (
+        ("orm_jsonable_encoder", orm_hydrate, orm_encode),
+        ("rows_orjson", rows_hydrate(FULL_FIELDS), rows_encode),
+        ("summary_rows_orjson", rows_hydrate(SUMMARY_FIELDS), rows_encode),
+    )
+    for name, hydrate, encode in paths:
+        # A fresh session per request, like the endpoints
+        def hydrate_request():
+            with Session() as db:
+                return hydrate(db, 1)
+
+        posts = hydrate_request()
+        body = encode(posts)
+        results[name] = {
+            "hydrate": measure(hydrate_request, args.iterations),
+            "encode": measure(lambda: encode(posts), args.iterations),
+            "response_bytes": len(body),
+        }
+
+    with Session() as db:
+        legacy = json.loads(orm_encode(orm_hydrate(db, 1)))
+        current = json.loads(rows_encode(rows_hydrate(FULL_FIELDS)(db, 1)))
+    assert current == [{field: post[field] for field in FULL_FIELDS} for post in legacy]
+
+    for name in ("rows_orjson", "summary_rows_orjson"):
+        for step in ("hydrate", "encode"):
+            before = results["orm_jsonable_encoder"][step]["mean_ms"]
+            after = results[name][step]["mean_ms"]
+            results[name][f"{step}_saved_ms"] = before - after
+            results[name][f"{step}_speedup"] = before / after
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark signup writes under a burst of concurrent signups
+
+Compares the previous signup path (SELECT the email, INSERT, COMMIT, then
+SELECT the row back), the single INSERT ... ON CONFLICT DO NOTHING RETURNING
+and group commit, which writes the signups of each window in one statement
+and one COMMIT. Passwords are pre-hashed, bcrypt costs the same on every
+path. Reports signups/sec, failed signups and latency per path.
+
+    python -m benchmarks.signup --signups 2000 --concurrency 50
+    DATABASE_ASYNC=true python -m benchmarks.signup --database-url postgresql://...
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+
+
+async def run_burst(signup, prefix: str, signups: int, concurrency: int, password_hash: str):
+    latencies = []
+    created = errors = 0
+
+    async def worker(worker_id: int):
+        nonlocal created, errors
+        for i in range(worker_id, signups, concurrency):
+            values = {"email": f"{prefix}{i}@example.com", "name": f"User {i}", "password": password_hash}
+            start = time.perf_counter()
+            try:
+                if await signup(values) is not None:
+                    created += 1
+            except SQLAlchemyError:
+                # e.g. SQLite giving up on the write lock, or no free pooled connection
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    return time.perf_counter() - start, created, errors, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="Database to write to (default: temporary SQLite file)")
+    parser.add_argument("--signups", type=int, default=2000, help="Signups per path")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--window-ms", type=float, default=5, help="Group commit window")
+    parser.add_argument("--max-batch", type=int, default=100, help="Group commit batch size limit")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so the database has to be configured
+    # before any application module is imported.
+    path = os.path.join(tempfile.gettempdir(), "bench_signup.db")
+    if not args.database_url and os.path.exists(path):
+        os.remove(path)
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{path}"
+
+    from benchmarks.common import PASSWORD_HASH, summarize
+    from database import open_primary_session
+    from group_commit import SignupBatcher
+    from migrate import upgrade_database
+    from models import User
+    from repository import create_user
+
+    upgrade_database()
+
+    async def select_insert(values):
+        db = open_primary_session()
+        try:
+            if await db.scalar(select(User).where(User.email == values["email"]).limit(1)) is not None:
+                return None
+            user = User(**values)
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+            return user
+        finally:
+            await db.close()
+
+    async def insert_returning(values):
+        db = open_primary_session()
+        try:
+            return await create_user(db, values)
+        finally:
+            await db.close()
+
+    batcher = SignupBatcher(args.window_ms / 1000, args.max_batch)
+
+    async def clear():
+        db = open_primary_session()
+        try:
+            await db.execute(delete(User).where(User.email.like("bench-%")))
+            await db.commit()
+        finally:
+            await db.close()
+
+    async def run_all():
+        results = {"signups": args.signups, "concurrency": args.concurrency}
+        for name, signup in (
+            ("select_insert", select_insert),
+            ("insert_returning", insert_returning),
+            ("group_commit", batcher.insert),
+        ):
+            await clear()
+            elapsed, created, errors, latencies = await run_burst(
+                signup, f"bench-{name}-", args.signups, args.concurrency, PASSWORD_HASH
+            )
+            results[name] = {
+                "created": created,
+                "errors": errors,
+                "signups_per_sec": created / elapsed,
+                "latency": summarize(latencies),
+            }
+        await clear()
+        return results
+
+    print(json.dumps(asyncio.run(run_all()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark worker cold start
+
+Starts a fresh uvicorn worker per run and measures how long it takes from
+process start until the application module is imported and until the first
+request is answered, for the development (migrations at startup) and
+production (no schema changes) startup modes.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --database-url postgresql://... --modes production
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import summarize
+from benchmarks.load import _free_port
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def time_import(env) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=PROJECT_DIR, env=env,
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_response(env, timeout: float) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=PROJECT_DIR, env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    raise SystemExit("The worker exited during startup")
+                try:
+                    if client.get("/").status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise SystemExit(f"No response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["development", "production"])
+    parser.add_argument("--database-url", help="Database to start against (default: temporary SQLite file)")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.database_url or (
+        f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_startup.db')}"
+    )
+    env.pop("DATABASE_AUTO_MIGRATE", None)
+
+    # Production workers expect an up to date schema
+    subprocess.run([sys.executable, "migrate.py"], cwd=PROJECT_DIR, env=env, check=True)
+
+    results = {}
+    for mode in args.modes:
+        mode_env = {**env, "ENVIRONMENT": mode}
+        imports = [time_import(mode_env) for _ in range(args.runs)]
+        first_responses = [time_first_response(mode_env, args.timeout) for _ in range(args.runs)]
+        results[mode] = {
+            "import": summarize(imports),
+            "first_response": summarize(first_responses),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark pre-built statements against building them per call
+
+For the hot lookups (user by email, the posts version and a posts page after
+a cursor) compares constructing the statement on every call, as the
+endpoints used to, with the pre-built statements of the repository module.
+Reports the Python overhead of producing an executable statement with its
+cache key, and the full round trip against a seeded SQLite database.
+
+    python -m benchmarks.statements --users 10000 --iterations 5000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import measure, seed_users, sqlite_engine
+from models import Post, User
+from pagination import CURSOR_FIELDS, SUMMARY_FIELDS, after_cursor, page_order, post_columns
+from repository import _posts_page, _posts_version, _user_by_email
+
+PAGE_FIELDS = tuple(sorted(set(SUMMARY_FIELDS).union(CURSOR_FIELDS)))
+
+
+def inline_user_by_email(email):
+    return select(User).where(User.email == email).limit(1), {}
+
+
+def prebuilt_user_by_email(email):
+    return _user_by_email, {"email": email}
+
+
+def inline_posts_version(user_id):
+    count = select(func.count(Post.id)).where(Post.user_id == user_id).scalar_subquery()
+    updated_at = select(func.max(Post.updated_at)).where(Post.user_id == user_id).scalar_subquery()
+    return select(User.posts_version, count, updated_at).where(User.id == user_id), {}
+
+
+def prebuilt_posts_version(user_id):
+    return _posts_version, {"user_id": user_id}
+
+
+def inline_posts_page(user_id, cursor):
+    query = (
+        select(*post_columns(PAGE_FIELDS))
+        .where(Post.user_id == user_id)
+        .where(after_cursor(*cursor))
+        .order_by(*page_order())
+        .limit(51)
+    )
+    return query, {}
+
+
+def prebuilt_posts_page(user_id, cursor):
+    params = {"user_id": user_id, "limit": 51, "cursor_created_at": cursor[0], "cursor_id": cursor[1]}
+    return _posts_page(PAGE_FIELDS, True), params
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts", type=int, default=200, help="Posts of the user whose pages are read")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--db-path", default=os.path.join(tempfile.gettempdir(), "bench_statements.db"))
+    args = parser.parse_args()
+
+    engine = sqlite_engine(args.db_path)
+    seed_users(engine, 0, args.users)
+    with engine.begin() as conn:
+        conn.execute(insert(Post), [
+            {"user_id": 1, "title": f"Post {i}", "content": "x" * 500} for i in range(args.posts)
+        ])
+    Session = sessionmaker(bind=engine)
+
+    email = f"user{args.users // 2}@example.com"
+    cursor = (datetime(2100, 1, 1), 0)
+    lookups = {
+        "user_by_email": (inline_user_by_email, prebuilt_user_by_email, (email,)),
+        "posts_version": (inline_posts_version, prebuilt_posts_version, (1,)),
+        "posts_page": (inline_posts_page, prebuilt_posts_page, (1, cursor)),
+    }
+
+    results = {"users": args.users, "posts": args.posts}
+    with Session() as db:
+        for name, (inline, prebuilt, call_args) in lookups.items():
+            row = {}
+            for variant, build in (("inline", inline), ("prebuilt", prebuilt)):
+                def prepare():
+                    statement, params = build(*call_args)
+                    return statement._generate_cache_key(), params
+
+                def execute():
+                    statement, params = build(*call_args)
+                    return db.execute(statement, params).all()
+
+                execute()
+                row[variant] = {
+                    "statement": measure(prepare, args.iterations),
+                    "round_trip": measure(execute, args.iterations),
+                }
+            row["statement_speedup"] = row["inline"]["statement"]["mean_ms"] / row["prebuilt"]["statement"]["mean_ms"]
+            row["round_trip_speedup"] = (
+                row["inline"]["round_trip"]["mean_ms"] / row["prebuilt"]["round_trip"]["mean_ms"]
+            )
+            results[name] = row
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark response validation and serialization per response
+
+For a user (/signup, /users/me) and a page of posts (/users/me/posts),
+compares what FastAPI does with a returned value and a response_model
+(validate against the model, serialize it, encode with JSONResponse), a
+precompiled TypeAdapter validating and dumping JSON, model_construct followed
+by a JSON dump, and the trusted path the endpoints use: picking the fields
+from the rows and encoding them with orjson, without validation. All paths
+produce the same JSON.
+
+    python -m benchmarks.validation --posts 50 --iterations 5000
+"""
+
+import argparse
+import json
+from datetime import datetime
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+
+from benchmarks.common import measure
+from responses import ORJSONResponse, model_response
+from schemas import PostFields, User
+
+
+def fastapi_path(model, content):
+    field = create_response_field(name="response", type_=model)
+
+    def encode():
+        value, errors = field.validate(content, {}, loc=("response",))
+        return JSONResponse(field.serialize(value, mode="json")).body
+    return encode
+
+
+def type_adapter_path(model, content):
+    adapter = TypeAdapter(model)
+    return lambda: adapter.dump_json(adapter.validate_python(content))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=50, help="Posts per page")
+    parser.add_argument("--excerpt-size", type=int, default=200, help="Characters of excerpt per post")
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    now = datetime.now().replace(microsecond=0)
+    user = {"id": 1, "name": "User 1", "email": "user1@example.com", "password": "hash",
+            "created_at": now, "updated_at": now}
+    posts = [
+        {"id": i, "user_id": 1, "title": f"Post {i}", "excerpt": "x" * args.excerpt_size,
+         "created_at": now, "updated_at": now}
+        for i in range(args.posts)
+    ]
+    posts_adapter = TypeAdapter(List[PostFields])
+
+    responses = {
+        "user": (user, {
+            "fastapi_response_model": fastapi_path(User, user),
+            "type_adapter": type_adapter_path(User, user),
+            "model_construct": lambda: User.model_construct(
+                **{name: user[name] for name in User.model_fields}).model_dump_json(),
+            "trusted_orjson": lambda: model_response(User, user).body,
+        }),
+        "posts_page": (posts, {
+            "fastapi_response_model": fastapi_path(List[PostFields], posts),
+            "type_adapter": type_adapter_path(List[PostFields], posts),
+            "model_construct": lambda: posts_adapter.dump_json(
+                [PostFields.model_construct(**post) for post in posts], exclude_unset=True),
+            "trusted_orjson": lambda: ORJSONResponse(posts).body,
+        }),
+    }
+
+    results = {"posts": args.posts}
+    for name, (content, paths) in responses.items():
+        expected = json.loads(paths["fastapi_response_model"]())
+        row = {}
+        for path, encode in paths.items():
+            body = json.loads(encode())
+            # FastAPI keeps the unset optional fields as nulls, the others leave them out
+            if name == "posts_page":
+                body = [{**dict.fromkeys(PostFields.model_fields), **post} for post in body]
+            assert body == expected, path
+            row[path] = measure(encode, args.iterations)
+        baseline = row["fastapi_response_model"]["mean_ms"]
+        for path in paths:
+            row[path]["speedup"] = baseline / row[path]["mean_ms"]
+        results[name] = row
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Small in-process caches shared by the request hot paths
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional TTL.
+
+    Entries can carry their own absolute expiry (a ``time.time()`` value),
+    which is capped by the cache-wide TTL. When ``max_weight`` is set, entries
+    are also evicted until the summed ``weigh(value)`` fits in it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        max_weight: Optional[int] = None,
+        weigh: Optional[Callable[[Any], int]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at, weight = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.weight -= weight
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+
+        if self.ttl is not None:
+            ttl_expiry = time.time() + self.ttl
+            expires_at = ttl_expiry if expires_at is None else min(expires_at, ttl_expiry)
+
+        weight = self.weigh(value) if self.weigh is not None else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            self.pop(key)
+            return
+
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.weight -= previous[2]
+            self._data[key] = (value, expires_at, weight)
+            self.weight += weight
+            while len(self._data) > self.maxsize or (
+                self.max_weight is not None and self.weight > self.max_weight
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self.weight -= evicted[2]
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            self.weight -= entry[2]
+        return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Check that the hot queries are served by index scans
+
+Runs EXPLAIN for the user and posts lookups made on every request against the
+configured database and exits with status 1 if any of them scans a whole
+table. On PostgreSQL sequential scans are disabled for the check, so small
+development tables still prove that a usable index exists.
+"""
+
+import json
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from database import engine
+from models import Post, User
+from pagination import after_cursor, page_order
+
+HOT_QUERIES = {
+    "user by email": select(User).where(User.email == "user@example.com").limit(1),
+    "user by id": select(User).where(User.id == 1),
+    "posts by user": select(Post).where(Post.user_id == 1),
+    "first posts page": select(Post).where(Post.user_id == 1).order_by(*page_order()).limit(51),
+    "next posts page": (
+        select(Post)
+        .where(Post.user_id == 1, after_cursor(datetime(2024, 1, 1, tzinfo=timezone.utc), 1))
+        .order_by(*page_order())
+        .limit(51)
+    ),
+}
+
+
+def _postgresql_plan(connection, sql, params):
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    nodes, stack = [], [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get("Plans", []))
+
+    full_scans = [node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"]
+    description = ", ".join(
+        f"{node['Node Type']} on {node.get('Index Name') or node['Relation Name']}"
+        for node in nodes if "Relation Name" in node
+    )
+    return full_scans, description
+
+
+def _sqlite_plan(connection, sql, params):
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).all()
+    details = [row[-1] for row in rows]
+    full_scans = [detail for detail in details if detail.startswith("SCAN") and "USING" not in detail]
+    return full_scans, "; ".join(details)
+
+
+def check_query_plans() -> bool:
+    explain = {"postgresql": _postgresql_plan, "sqlite": _sqlite_plan}.get(engine.dialect.name)
+    if explain is None:
+        print(f"Unsupported database: {engine.dialect.name}")
+        return False
+
+    ok = True
+    with engine.connect() as connection:
+        for name, query in HOT_QUERIES.items():
+            compiled = query.compile(dialect=engine.dialect)
+            params = compiled.params
+            if compiled.positional:
+                params = tuple(params[key] for key in compiled.positiontup)
+
+            full_scans, description = explain(connection, str(compiled), params)
+            status = "FULL SCAN" if full_scans else "ok"
+            print(f"{status:>9}  {name}: {description}")
+            ok = ok and not full_scans
+        connection.rollback()
+
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_plans() else 1)
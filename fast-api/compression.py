@@ -0,0 +1,167 @@
+"""
+Negotiated response compression
+
+CompressionMiddleware compresses complete response bodies with the best
+encoding the client accepts out of COMPRESSION_ENCODINGS: brotli (br),
+zstd and gzip. Small bodies, already encoded bodies and content types that
+don't compress well are sent as is. Bodies of COMPRESSION_OFFLOAD_BYTES or
+more are compressed in the threadpool so the event loop keeps serving other
+requests. Streaming responses pass through untouched.
+"""
+
+import gzip
+import threading
+from typing import Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import settings
+from metrics import track
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+
+def _gzip(level: int) -> Callable[[bytes], bytes]:
+    return lambda body: gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _brotli(quality: int) -> Callable[[bytes], bytes]:
+    try:
+        import brotli
+    except ImportError:
+        raise RuntimeError("COMPRESSION_ENCODINGS=br requires the brotli package")
+    return lambda body: brotli.compress(body, quality=quality)
+
+
+def _zstd(level: int) -> Callable[[bytes], bytes]:
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("COMPRESSION_ENCODINGS=zstd requires the zstandard package")
+    # Compressor objects can't be shared between threads
+    local = threading.local()
+
+    def compress(body):
+        compressor = getattr(local, "compressor", None)
+        if compressor is None:
+            compressor = local.compressor = zstandard.ZstdCompressor(level=level)
+        return compressor.compress(body)
+
+    return compress
+
+
+def create_compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    """Compress functions of the configured encodings, in order of server preference"""
+    factories = {
+        "br": lambda: _brotli(settings.compression_brotli_quality),
+        "zstd": lambda: _zstd(settings.compression_zstd_level),
+        "gzip": lambda: _gzip(settings.compression_gzip_level),
+    }
+    compressors = {}
+    for encoding in (settings.compression_encodings or "").split(","):
+        encoding = encoding.strip()
+        if not encoding:
+            continue
+        if encoding not in factories:
+            raise ValueError(f"Unknown compression encoding: {encoding}")
+        compressors[encoding] = factories[encoding]()
+    return compressors
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Encodings of an Accept-Encoding header mapped to their quality values"""
+    accepted = {}
+    for item in header.split(","):
+        encoding, _, params = item.partition(";")
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[encoding] = quality
+    return accepted
+
+
+def choose_encoding(header: str, available: List[str]) -> Optional[str]:
+    """The acceptable encoding with the highest quality, ties go to the server's preference"""
+    accepted = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with a negotiated encoding"""
+
+    def __init__(self, app, compressors: Optional[Dict[str, Callable[[bytes], bytes]]] = None):
+        self.app = app
+        self.compressors = create_compressors() if compressors is None else compressors
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.compressors:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), list(self.compressors))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the body shows whether compressing is worthwhile
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < settings.compression_minimum_size:
+                passthrough = True
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                await send(start_message)
+                await send(message)
+                return
+
+            compress = self.compressors[encoding]
+            with track("compression"):
+                if len(body) >= settings.compression_offload_bytes:
+                    compressed = await run_in_threadpool(compress, body)
+                else:
+                    compressed = compress(body)
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,3 +1,4 @@
+import os
 from typing import Optional
 
 from pydantic import Field
@@ -24,8 +25,57 @@ class Settings(BaseSettings):
 
         description="JWT token expiration time in minutes"
     )
+    jwt_backend: str = Field(
+        default="auto",
+        description="JWT implementation: hmac (built-in, HS* algorithms only), jose, or auto to prefer hmac"
+    )
+
+    token_cache_size: int = Field(
+        default=10000,
+        description="Verified tokens kept in memory by get_current_user, 0 disables the cache"
+    )
+    token_cache_ttl_seconds: int = Field(
+        default=300,
+        description="Longest time a verified token is trusted without checking it again"
+    )
+
+    # Posts cache configuration
+    posts_cache_backend: str = Field(
+        default="local",
+        description="Posts cache backend: local (in-process LRU), redis (shared) or none"
+    )
+    posts_cache_url: Optional[str] = Field(
+        default=None,
+        description="Connection URL of the shared posts cache when the backend is redis"
+    )
+    posts_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Estimated memory the local posts cache may use before evicting users"
+    )
+    posts_cache_max_entry_bytes: int = Field(
+        default=1024 * 1024,
+        description="Post lists larger than this are never cached"
+    )
+    posts_cache_ttl_seconds: int = Field(
+        default=300,
+        description="Lifetime of cached post lists, bounds staleness for writes made outside the ORM"
+    )
+
+    # Password hashing configuration
+    password_hash_workers: int = Field(
+        default_factory=lambda: os.cpu_count() or 1,
+        description="Processes in the bcrypt pool, 0 hashes in the threadpool instead"
+    )
+    password_hash_max_pending: int = Field(
+        default=256,
+        description="Password operations allowed in flight before requests are rejected with 503"
+    )
 
     # Server configuration
+    environment: str = Field(
+        default="development",
+        description="development or production; production skips schema changes at startup"
+    )
     host: str = Field(
 
         description="Server host"
@@ -38,12 +88,176 @@ class Settings(BaseSettings):
 
         description="Debug mode"
     )
+    server_workers: int = Field(
+        default_factory=lambda: os.cpu_count() or 1,
+        description="Worker processes started by run.py in production"
+    )
+    server_loop: str = Field(
+        default="auto",
+        description="Event loop: auto (uvloop when installed), uvloop or asyncio"
+    )
+    server_http: str = Field(
+        default="auto",
+        description="HTTP parser: auto (httptools when installed), httptools or h11"
+    )
+    server_keepalive: int = Field(
+        default=5,
+        description="Seconds an idle keep-alive connection is held open"
+    )
+    server_backlog: int = Field(
+        default=2048,
+        description="Pending connections the listening socket queues"
+    )
+    server_max_requests: int = Field(
+        default=10000,
+        description="Requests after which a worker is replaced, 0 never recycles workers"
+    )
+    server_max_requests_jitter: int = Field(
+        default=1000,
+        description="Random extra requests per worker so workers don't all recycle at once"
+    )
+    server_timeout: int = Field(
+        default=60,
+        description="Seconds a silent worker is given before it is killed and replaced"
+    )
+    server_graceful_timeout: int = Field(
+        default=30,
+        description="Seconds workers get to finish in-flight requests on restart or shutdown"
+    )
 
     # Database logging configuration
     database_logging: bool = Field(
         default=False,
         description="Enable database query logging"
     )
+    database_slow_query_ms: float = Field(
+        default=200,
+        description="Statements taking at least this long are logged with their route, 0 disables the log"
+    )
+    database_repeated_query_mode: str = Field(
+        default="warn",
+        description="What to do when one request runs the same statement too often: off, warn or raise"
+    )
+    database_repeated_query_threshold: int = Field(
+        default=10,
+        description="Runs of the same statement within one request that count as an N+1 query"
+    )
+    database_auto_migrate: Optional[bool] = Field(
+        default=None,
+        description="Apply pending Alembic migrations when the application starts, by default only outside production"
+    )
+    database_async: bool = Field(
+        default=False,
+        description="Use the async engine (asyncpg/aiosqlite) instead of the sync engine in request handlers"
+    )
+
+    # Read replicas
+    database_replica_urls: Optional[str] = Field(
+        default=None,
+        description="Comma separated read replica URLs used by read-only endpoints"
+    )
+    database_replica_sticky_seconds: int = Field(
+        default=5,
+        description="How long a client reads from the primary after one of its requests wrote to it"
+    )
+    database_replica_eject_seconds: int = Field(
+        default=30,
+        description="How long a replica is left out of rotation after a connection failure"
+    )
+
+    # Connection pool configuration
+    database_pool_size: int = Field(
+        default=5,
+        description="Connections kept open in the pool"
+    )
+    database_max_overflow: int = Field(
+        default=10,
+        description="Connections opened beyond the pool size under load"
+    )
+    database_pool_timeout: float = Field(
+        default=30,
+        description="Seconds to wait for a free connection before failing the request"
+    )
+    database_pool_recycle: int = Field(
+        default=1800,
+        description="Seconds after which pooled connections are replaced, -1 keeps them forever"
+    )
+    database_pool_pre_ping: bool = Field(
+        default=False,
+        description="Test connections when they are checked out of the pool"
+    )
+    database_pool_prewarm: bool = Field(
+        default=True,
+        description="Open the pool's connections at startup instead of on the first requests"
+    )
+    database_pgbouncer: bool = Field(
+        default=False,
+        description="Run behind a transaction pooler: no local pool and no cached prepared statements"
+    )
+
+    # Signups
+    signup_batch_window_ms: float = Field(
+        default=0,
+        description="Milliseconds concurrent signups are gathered to be written in one INSERT and COMMIT, 0 writes each on its own"
+    )
+    signup_batch_max_size: int = Field(
+        default=100,
+        description="Signups that trigger writing a batch before its window ends"
+    )
+
+    # Exports
+    export_batch_size: int = Field(
+        default=1000,
+        description="Posts fetched per round trip by the streaming exports"
+    )
+    admin_emails: Optional[str] = Field(
+        default=None,
+        description="Comma separated emails of the users allowed to use the admin endpoints"
+    )
+
+    # Post listings
+    post_excerpt_length: int = Field(
+        default=200,
+        description="Characters of content returned as the excerpt of a post"
+    )
+
+    # Response compression
+    compression_encodings: str = Field(
+        default="br,gzip",
+        description="Comma separated encodings in order of preference (br, zstd, gzip), empty disables compression"
+    )
+    compression_minimum_size: int = Field(
+        default=1024,
+        description="Smaller response bodies are sent uncompressed"
+    )
+    compression_offload_bytes: int = Field(
+        default=64 * 1024,
+        description="Bodies at least this large are compressed in the threadpool instead of on the event loop"
+    )
+    compression_gzip_level: int = Field(
+        default=6,
+        description="gzip compression level, 1-9"
+    )
+    compression_brotli_quality: int = Field(
+        default=4,
+        description="Brotli quality, 0-11"
+    )
+    compression_zstd_level: int = Field(
+        default=3,
+        description="zstd compression level, 1-22"
+    )
+
+    # Random user selection
+    random_user_index_refresh_seconds: int = Field(
+        default=60,
+        description="How often the cached user id index used by /random is rebuilt"
+    )
+
+    @property
+    def run_migrations_at_startup(self) -> bool:
+        if self.database_auto_migrate is not None:
+            return self.database_auto_migrate
+        return self.environment != "production"
 
     class Config:
         env_file = ".env"
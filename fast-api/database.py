@@ -1,29 +1,377 @@
+import asyncio
 import logging
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
 
 from config import settings
-from sqlalchemy import create_engine
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from metrics import instrument_engine, timed_pool_class
+from query_stats import instrument_queries
+
+logger = logging.getLogger(__name__)
+
+# Cookie holding the time until which a client's reads go to the primary
+STICKY_COOKIE = "db_primary_until"
+
+# Session.info keys used for read-your-writes stickiness
+WROTE_KEY = "replica_routing_wrote"
+RESPONSE_KEY = "replica_routing_response"
+REPLICA_KEY = "replica_routing_replica"
+
+# Async drivers used when DATABASE_ASYNC is enabled
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Swap the driver of a database URL for its async counterpart"""
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def _unique_statement_name():
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def engine_options(url, label: str) -> dict:
+    """Pool and driver arguments for an engine connecting to url"""
+    if settings.database_pgbouncer:
+        # The transaction pooler owns the connections; prepared statements
+        # must not outlive a transaction since the next one may run on
+        # another server connection.
+        connect_args = {}
+        if url.get_driver_name() == "asyncpg":
+            connect_args = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": _unique_statement_name,
+            }
+        elif url.get_driver_name() == "psycopg":
+            connect_args = {"prepare_threshold": None}
+        return {"poolclass": NullPool, "connect_args": connect_args}
+
+    poolclass = timed_pool_class(url, label)
+    options = {
+        "poolclass": poolclass,
+        "pool_recycle": settings.database_pool_recycle,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+    }
+    if issubclass(poolclass, QueuePool):
+        options.update(
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+        )
+    return options
+
 
 # Configure SQLAlchemy logging based on settings
 if settings.database_logging:
     logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
     logging.getLogger('sqlalchemy.pool').setLevel(logging.INFO)
     logging.getLogger('sqlalchemy.dialects').setLevel(logging.INFO)
-    engine = create_engine(settings.database_url, echo=True)
 else:
     logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
     logging.getLogger('sqlalchemy.pool').setLevel(logging.WARNING)
     logging.getLogger('sqlalchemy.dialects').setLevel(logging.WARNING)
-    engine = create_engine(settings.database_url, echo=False)
+
+engine = create_engine(
+    settings.database_url,
+    echo=settings.database_logging,
+    **engine_options(make_url(settings.database_url), "primary"),
+)
+# Queries first: a repeated statement raises in before_cursor_execute, where
+# handle_error never runs, so no other listener may have started timing it
+instrument_queries(engine)
+instrument_engine(engine, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if settings.database_async:
+    async_url = make_url(async_database_url(settings.database_url))
+    async_engine = create_async_engine(
+        async_url,
+        echo=settings.database_logging,
+        **engine_options(async_url, "primary_async"),
+    )
+    instrument_queries(async_engine)
+    instrument_engine(async_engine, "primary_async")
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+class Replica:
+    """A read replica, left out of rotation for a while after connection failures"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        if settings.database_async:
+            async_url = make_url(async_database_url(url))
+            self.engine = create_async_engine(
+                async_url, echo=settings.database_logging, **engine_options(async_url, name)
+            )
+            self.sessionmaker = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+        else:
+            self.engine = create_engine(
+                url, echo=settings.database_logging, **engine_options(make_url(url), name)
+            )
+            self.sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        instrument_queries(self.engine)
+        instrument_engine(self.engine, name)
+        self.ejected_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def eject(self):
+        self.ejected_until = time.monotonic() + settings.database_replica_eject_seconds
+        logger.warning("Ejecting read replica %s for %ss", self.name, settings.database_replica_eject_seconds)
+
+
+replicas = [
+    Replica(f"replica{i}", url.strip())
+    for i, url in enumerate((settings.database_replica_urls or "").split(","))
+    if url.strip()
+]
+
+
+def pick_replica():
+    """A random healthy replica, or None when reads have to go to the primary"""
+    healthy = [replica for replica in replicas if replica.healthy]
+    return random.choice(healthy) if healthy else None
+
+
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
+class ThreadedSession:
+    """
+    Exposes a sync Session through the awaitable AsyncSession methods used by
+    the route handlers. Every blocking call runs in Starlette's threadpool, so
+    the sync driver can be benchmarked against the async one with the same
+    handlers.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    @property
+    def info(self):
+        return self.sync_session.info
+
+    async def execute(self, statement, params=None, **kwargs):
+        def execute():
+            # Buffer the rows so the result can be consumed outside the threadpool
+            return self.sync_session.execute(statement, params, **kwargs).freeze()()
+        return await run_in_threadpool(execute)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def stream_partitions(db, statement, size: int):
+    """
+    Yield the rows of statement as lists of up to size mappings, fetched
+    through a server-side cursor where the driver has one, so only one
+    partition is held in memory at a time
+    """
+    statement = statement.execution_options(yield_per=size)
+    if isinstance(db, ThreadedSession):
+        result = await run_in_threadpool(db.sync_session.execute, statement)
+        try:
+            partitions = result.mappings().partitions()
+            while True:
+                rows = await run_in_threadpool(next, partitions, None)
+                if rows is None:
+                    break
+                yield rows
+        finally:
+            await run_in_threadpool(result.close)
+    else:
+        result = await db.stream(statement)
+        try:
+            async for rows in result.mappings().partitions():
+                yield rows
+        finally:
+            await result.close()
+
+
+async def _prewarm(engine) -> int:
+    pool = getattr(engine, "sync_engine", engine).pool
+    if not isinstance(pool, QueuePool):
+        return 0
+
+    if settings.database_async:
+        results = await asyncio.gather(
+            *(engine.connect().start() for _ in range(pool.size())), return_exceptions=True
+        )
+    else:
+        results = await asyncio.gather(
+            *(run_in_threadpool(engine.connect) for _ in range(pool.size())), return_exceptions=True
+        )
+
+    connections = [result for result in results if not isinstance(result, Exception)]
+    errors = [result for result in results if isinstance(result, Exception)]
+    for connection in connections:
+        # Closing returns the connection to the pool, where it stays open
+        if settings.database_async:
+            await connection.close()
+        else:
+            connection.close()
+    if errors:
+        logger.warning("Could not pre-warm the connection pool: %s", errors[0])
+    return len(connections)
+
+
+async def prewarm_pool() -> int:
+    """
+    Open the connections of the pools used by request handlers, primary and
+    replicas, so the first requests don't pay for connecting. Returns the
+    number of connections opened.
+    """
+    engines = [async_engine if settings.database_async else engine]
+    engines.extend(replica.engine for replica in replicas)
+    return sum(await asyncio.gather(*(_prewarm(target) for target in engines)))
+
+
+def _open_session(factory):
+    session = factory()
+    return session if settings.database_async else ThreadedSession(session)
+
+
+def open_primary_session():
+    """Session on the primary, callers have to close it"""
+    return _open_session(AsyncSessionLocal if settings.database_async else SessionLocal)
+
+
+async def get_db(response: Response):
+    """Session on the primary, for handlers that write"""
+    db = open_primary_session()
+    db.info[RESPONSE_KEY] = response
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def open_read_session(request: Request):
+    """
+    Session for reads and the replica it is on: a healthy replica when
+    replicas are configured, unless the client wrote to the primary within
+    the last DATABASE_REPLICA_STICKY_SECONDS. Callers have to close it.
+    """
+    replica = None
     try:
+        sticky = float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        sticky = False
+    if not sticky:
+        replica = pick_replica()
+
+    if replica is None:
+        return open_primary_session(), None
+    db = _open_session(replica.sessionmaker)
+    db.info[REPLICA_KEY] = replica.name
+    return db, replica
+
+
+async def get_read_db(request: Request):
+    """Session for read-only handlers, see open_read_session"""
+    db, replica = open_read_session(request)
+    try:
+        yield db
+    except DBAPIError as e:
+        if replica is not None and (e.connection_invalidated or isinstance(e, OperationalError)):
+            replica.eject()
+        raise
+    finally:
+        await db.close()
+
+
+@asynccontextmanager
+async def primary_session(db):
+    """
+    db itself when it is on the primary, otherwise a primary session for the
+    block. Caches are filled through it: ORM writes on the primary invalidate
+    them, and rows read from a lagging replica right after would stay cached
+    for the whole TTL.
+    """
+    if db.info.get(REPLICA_KEY) is None:
         yield db
+        return
+    primary = open_primary_session()
+    try:
+        yield primary
     finally:
-        db.close()
+        await primary.close()
+
+
+@event.listens_for(Session, "after_flush")
+def _record_write(session, flush_context):
+    session.info[WROTE_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement_write(orm_execute_state):
+    # Writes executed as statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[WROTE_KEY] = True
+
+
+def stick_to_primary(response: Response):
+    """Send the client's reads to the primary for a while, the replicas may not have its write yet"""
+    if replicas:
+        seconds = settings.database_replica_sticky_seconds
+        response.set_cookie(STICKY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True)
+
+
+@event.listens_for(Session, "after_commit")
+def _stick_to_primary(session):
+    response = session.info.get(RESPONSE_KEY)
+    if session.info.pop(WROTE_KEY, False) and response is not None:
+        stick_to_primary(response)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_write(session):
+    session.info.pop(WROTE_KEY, None)
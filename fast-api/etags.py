@@ -0,0 +1,36 @@
+"""
+Weak ETags and conditional GET helpers
+
+ETags are built from cheap validators, such as a user's updated_at or the
+count and latest updated_at of their posts, together with everything else
+that shapes the response. They are weak because the same representation may
+be sent with different content encodings.
+"""
+
+import hashlib
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b("\x1f".join(str(part) for part in parts).encode(), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether If-None-Match matches etag, using the weak comparison"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
@@ -0,0 +1,67 @@
+"""
+Streaming NDJSON exports of posts
+
+Posts are read in id order through a server-side cursor, EXPORT_BATCH_SIZE
+rows per round trip, and written out as newline delimited JSON as they
+arrive, so memory stays flat however many posts are exported. Every line
+carries the post id: an interrupted export resumes after the last line
+received with after_id, and since limits an export to the posts updated
+from then on.
+"""
+
+import logging
+import time
+from datetime import datetime
+from typing import AsyncIterator, Optional, Tuple
+
+import anyio
+import orjson
+from sqlalchemy import select
+
+from config import settings
+from database import stream_partitions
+from metrics import posts_exported_total, track
+from models import Post
+from pagination import POST_FIELDS, post_columns
+
+logger = logging.getLogger(__name__)
+
+# Fields exported when none are requested: full posts, the content makes the excerpt redundant
+EXPORT_FIELDS = tuple(field for field in POST_FIELDS if field != "excerpt")
+
+
+def export_query(fields: Tuple[str, ...], user_id: Optional[int] = None,
+                 since: Optional[datetime] = None, after_id: Optional[int] = None):
+    """Posts in id order, always with their id so exports can be resumed"""
+    if "id" not in fields:
+        fields = ("id",) + fields
+    query = select(*post_columns(fields))
+    if user_id is not None:
+        query = query.where(Post.user_id == user_id)
+    if since is not None:
+        query = query.where(Post.updated_at >= since)
+    if after_id is not None:
+        query = query.where(Post.id > after_id)
+    return query.order_by(Post.id)
+
+
+async def ndjson_lines(db, query, export: str) -> AsyncIterator[bytes]:
+    """Encode the rows of query as NDJSON, one chunk per partition, closing db when done"""
+    rows = 0
+    start = time.perf_counter()
+    partitions = stream_partitions(db, query, settings.export_batch_size)
+    try:
+        async for partition in partitions:
+            with track("serialization"):
+                chunk = b"".join(orjson.dumps(dict(row)) + b"\n" for row in partition)
+            rows += len(partition)
+            posts_exported_total.inc(export, amount=len(partition))
+            yield chunk
+    finally:
+        # Also runs when the client went away and the response task is cancelled
+        with anyio.CancelScope(shield=True):
+            await partitions.aclose()
+            await db.close()
+        elapsed = time.perf_counter() - start
+        logger.info("Exported %s posts (%s) in %.2fs, %.0f rows/sec",
+                    rows, export, elapsed, rows / elapsed if elapsed else 0)
@@ -2,20 +2,30 @@
 """
 Automated script to generate comprehensive mock data for the FastAPI demo application
 Generates 100+ users with 20-50 posts each without user interaction
+
+Use --bulk for load-testing datasets: rows are generated in parallel worker
+processes with deterministic seeds and streamed into PostgreSQL with COPY
+(executemany batches on SQLite), e.g.
+
+    python3 generate_mock_data_auto.py --bulk --users 200000 --workers 8
 """
 
+import argparse
+import csv
+import io
+import multiprocessing
 import random
+import time
 from datetime import datetime, timedelta
 
 from faker import Faker
+from sqlalchemy import func, select, text
 from sqlalchemy.orm import Session
 
-from auth import get_password_hash
 from database import SessionLocal, engine
-from models import Base, Post, User
-
-# Create tables
-Base.metadata.create_all(bind=engine)
+from migrate import upgrade_database
+from models import Post, User
+from passwords import get_password_hash
 
 # Initialize Faker for generating realistic data
 fake = Faker()
@@ -163,11 +173,13 @@ def generate_mock_data_auto(num_users=100, min_posts_per_user=20, max_posts_per_
 
         print(f"🚀 Generating {num_users} users with {min_posts_per_user}-{max_posts_per_user} posts each...")
 
+        # Every user shares the same password, hash it once
+        hashed_password = get_password_hash("password123")
+
         # Generate users
         users = []
         for i in range(num_users):
             user_data = generate_user_data()
-            hashed_password = get_password_hash(user_data["password"])
 
             user = User(
                 name=user_data["name"],
@@ -249,24 +261,220 @@ def generate_mock_data_auto(num_users=100, min_posts_per_user=20, max_posts_per_
         db.close()
 
 
+# Users generated per work unit in bulk mode
+BULK_CHUNK_USERS = 1000
+
+# Bulk timestamps fall in the year before this date rather than before now, so
+# the same seed also gives the same dates
+BULK_EPOCH = datetime(2024, 1, 1)
+
+USER_COLUMNS = ("id", "name", "email", "password", "created_at", "updated_at")
+POST_COLUMNS = ("user_id", "title", "content", "created_at", "updated_at")
+
+# Set in each bulk worker process by _init_bulk_worker
+_bulk_state = {}
+
+
+class ContentPool:
+    """
+    Pre-generated Faker text that bulk workers assemble posts from.
+
+    Calling Faker for every paragraph is far too slow for millions of posts,
+    so each worker builds the same pool once from the base seed and then picks
+    from it with a per-chunk random generator.
+    """
+
+    def __init__(self, seed, size=500):
+        faker = Faker()
+        faker.seed_instance(seed)
+        self.names = [faker.name() for _ in range(size)]
+        self.email_parts = [faker.email().split("@") for _ in range(size)]
+        self.sentences = [faker.sentence() for _ in range(size * 4)]
+        self.paragraphs = [faker.paragraph(nb_sentences=3) for _ in range(size)]
+        self.texts = [faker.text(max_nb_chars=500) for _ in range(size)]
+        self.dates = [
+            faker.date_between(start_date=BULK_EPOCH - timedelta(days=365), end_date=BULK_EPOCH).strftime('%B %d, %Y')
+            for _ in range(size)
+        ]
+
+    def post(self, rng, category):
+        title = rng.choice(POST_TITLES).format(topic=category)
+        content = rng.choice(POST_CONTENT_TEMPLATES).format(
+            title=title,
+            intro=rng.choice(self.paragraphs),
+            key_points="\n".join(f"- {rng.choice(self.sentences)}" for _ in range(rng.randint(3, 6))),
+            main_content=rng.choice(self.texts),
+            analysis=rng.choice(self.texts),
+            recommendations="\n".join(f"- {rng.choice(self.sentences)}" for _ in range(rng.randint(2, 4))),
+            summary=rng.choice(self.paragraphs),
+            conclusion=rng.choice(self.paragraphs),
+            date=rng.choice(self.dates),
+        )
+        return title, content
+
+
+def _init_bulk_worker(seed, password_hash, min_posts, max_posts, as_csv):
+    _bulk_state.update(
+        pool=ContentPool(seed),
+        seed=seed,
+        password_hash=password_hash,
+        min_posts=min_posts,
+        max_posts=max_posts,
+        as_csv=as_csv,
+    )
+
+
+def _to_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _generate_bulk_chunk(chunk):
+    """Generate the users and posts of one chunk, identical for the same seed and chunk"""
+    first_id, count = chunk
+    state = _bulk_state
+    pool = state["pool"]
+    rng = random.Random(state["seed"] * 1_000_003 + first_id)
+
+    users, posts = [], []
+    for user_id in range(first_id, first_id + count):
+        local, domain = rng.choice(pool.email_parts)
+        joined = BULK_EPOCH - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        users.append((user_id, rng.choice(pool.names), f"{local}.{user_id}@{domain}",
+                      state["password_hash"], joined, joined))
+
+        for _ in range(rng.randint(state["min_posts"], state["max_posts"])):
+            title, content = pool.post(rng, rng.choice(POST_CATEGORIES))
+            created_at = BULK_EPOCH - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            posts.append((user_id, title, content, created_at, created_at))
+
+    if state["as_csv"]:
+        return count, len(posts), _to_csv(users), _to_csv(posts)
+    return count, len(posts), users, posts
+
+
+def _copy_rows(connection, table, columns, data):
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            io.StringIO(data),
+        )
+
+
+def _insert_rows(connection, table, columns, rows):
+    placeholders = ", ".join("?" for _ in columns)
+    connection.cursor().executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+    )
+
+
+def generate_mock_data_bulk(num_users=100_000, min_posts_per_user=20, max_posts_per_user=50,
+                            clear_existing=True, workers=None, seed=42):
+    """Generate a large dataset quickly for load tests, returning row counts and throughput"""
+    postgres = engine.dialect.name == "postgresql"
+    if not postgres and engine.dialect.name != "sqlite":
+        raise RuntimeError(f"Bulk mode supports PostgreSQL and SQLite, not {engine.dialect.name}")
+
+    with engine.begin() as conn:
+        if clear_existing:
+            print("🗑️  Clearing existing data...")
+            if postgres:
+                conn.execute(text("TRUNCATE posts, users RESTART IDENTITY"))
+            else:
+                conn.execute(text("DELETE FROM posts"))
+                conn.execute(text("DELETE FROM users"))
+        first_user_id = conn.execute(select(func.coalesce(func.max(User.id), 0))).scalar() + 1
+
+    password_hash = get_password_hash("password123")
+    chunks = [
+        (first_user_id + start, min(BULK_CHUNK_USERS, num_users - start))
+        for start in range(0, num_users, BULK_CHUNK_USERS)
+    ]
+    workers = workers or multiprocessing.cpu_count()
+    print(f"🚀 Bulk generating {num_users} users with {min_posts_per_user}-{max_posts_per_user} "
+          f"posts each using {workers} workers (seed {seed})...")
+
+    write = _copy_rows if postgres else _insert_rows
+    users_written = posts_written = 0
+    started = time.perf_counter()
+
+    raw = engine.raw_connection()
+    try:
+        with multiprocessing.Pool(
+            workers,
+            initializer=_init_bulk_worker,
+            initargs=(seed, password_hash, min_posts_per_user, max_posts_per_user, postgres),
+        ) as pool:
+            for user_count, post_count, users, posts in pool.imap(_generate_bulk_chunk, chunks):
+                write(raw.driver_connection, "users", USER_COLUMNS, users)
+                write(raw.driver_connection, "posts", POST_COLUMNS, posts)
+                raw.commit()
+
+                users_written += user_count
+                posts_written += post_count
+                elapsed = time.perf_counter() - started
+                print(f"   {users_written} users, {posts_written} posts "
+                      f"({(users_written + posts_written) / elapsed:,.0f} rows/sec)")
+
+        if postgres:
+            # Users were copied with explicit ids, move the sequence past them
+            with raw.driver_connection.cursor() as cursor:
+                cursor.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT max(id) FROM users))")
+            raw.commit()
+    finally:
+        raw.close()
+
+    elapsed = time.perf_counter() - started
+    rows_per_second = (users_written + posts_written) / elapsed
+    print(f"🎉 Bulk load completed in {elapsed:.1f}s")
+    print(f"   📊 Total users: {users_written}")
+    print(f"   📝 Total posts: {posts_written}")
+    print(f"   ⚡ Throughput: {rows_per_second:,.0f} rows/sec")
+
+    return {
+        "users_created": users_written,
+        "posts_created": posts_written,
+        "seconds": elapsed,
+        "rows_per_second": rows_per_second,
+    }
+
+
 def main():
     """Main function to run the automated mock data generation"""
+    parser = argparse.ArgumentParser(description="Generate mock users and posts")
+    parser.add_argument("--users", type=int, default=100, help="Number of users to create")
+    parser.add_argument("--min-posts", type=int, default=20, help="Minimum posts per user")
+    parser.add_argument("--max-posts", type=int, default=50, help="Maximum posts per user")
+    parser.add_argument("--keep-existing", action="store_true", help="Do not clear existing data first")
+    parser.add_argument("--bulk", action="store_true", help="Use the parallel COPY/executemany loader")
+    parser.add_argument("--workers", type=int, default=None, help="Bulk generator processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for deterministic bulk data")
+    args = parser.parse_args()
+
     print("🎭 Automated Mock Data Generator for FastAPI Demo")
     print("=" * 55)
 
-    # Default configuration
-    num_users = 100
-    min_posts = 20
-    max_posts = 50
-    clear_existing = True
+    num_users = args.users
+    min_posts = args.min_posts
+    max_posts = args.max_posts
+    clear_existing = not args.keep_existing
 
     print(f"📋 Configuration:")
     print(f"   Users: {num_users}")
     print(f"   Posts per user: {min_posts}-{max_posts}")
     print(f"   Estimated total posts: {num_users * (min_posts + max_posts) // 2}")
     print(f"   Clear existing data: {clear_existing}")
+    print(f"   Mode: {'bulk' if args.bulk else 'ORM'}")
 
-    result = generate_mock_data_auto(num_users, min_posts, max_posts, clear_existing)
+    # Create or upgrade tables
+    upgrade_database()
+
+    if args.bulk:
+        result = generate_mock_data_bulk(num_users, min_posts, max_posts, clear_existing,
+                                         workers=args.workers, seed=args.seed)
+    else:
+        result = generate_mock_data_auto(num_users, min_posts, max_posts, clear_existing)
 
     if result:
         print(f"\n✅ Successfully generated mock data!")
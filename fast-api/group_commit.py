@@ -0,0 +1,81 @@
+"""
+Group commit for signups
+
+With SIGNUP_BATCH_WINDOW_MS set, signups arriving within the window are
+written together: one multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING
+and one COMMIT per batch instead of per signup. A signup waits at most the
+window, less once SIGNUP_BATCH_MAX_SIZE signups are pending, and gets its
+own user back, or None when its email was taken, also by an earlier signup
+of the same batch.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+
+from config import settings
+from database import open_primary_session
+from repository import create_users
+
+logger = logging.getLogger(__name__)
+
+
+class SignupBatcher:
+    def __init__(self, window_seconds: float, max_size: int):
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: Set[asyncio.Task] = set()
+
+    async def insert(self, values: dict) -> Optional[dict]:
+        """Queue a user for the next batch and wait until it is committed"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((values, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._write(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]):
+        db = open_primary_session()
+        try:
+            created = await create_users(db, [values for values, _ in batch])
+        except Exception as e:
+            logger.warning("Signup batch of %s failed: %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            await db.close()
+
+        for values, future in batch:
+            # Popped so a second signup of the same email in the batch gets None
+            user = created.pop(values["email"], None)
+            if not future.done():
+                future.set_result(user)
+
+    async def close(self):
+        """Write the pending signups and wait for the batches in flight"""
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+
+signup_batcher = (
+    SignupBatcher(settings.signup_batch_window_ms / 1000, settings.signup_batch_max_size)
+    if settings.signup_batch_window_ms > 0 else None
+)
@@ -0,0 +1,139 @@
+"""
+Backends signing and verifying the access tokens
+
+JoseJWTBackend goes through python-jose on every call. HMACJWTBackend handles
+the HS256/HS384/HS512 algorithms directly: the HMAC key state and the
+encoded header are computed once, and decoding only validates what the
+application relies on (algorithm, signature, exp and nbf). Both produce and
+accept the same compact JWS tokens, so the backend can be switched without
+invalidating issued tokens.
+"""
+
+import base64
+import binascii
+import calendar
+import hashlib
+import hmac
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+import orjson
+
+from config import settings
+
+HMAC_ALGORITHMS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+# Registered claims holding NumericDate values
+_TIME_CLAIMS = ("exp", "nbf", "iat")
+
+
+class TokenError(Exception):
+    """Raised for tokens that are malformed, badly signed or expired"""
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+class JWTBackend:
+    """Interface shared by the JWT backends"""
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class JoseJWTBackend(JWTBackend):
+    def __init__(self, secret_key: str, algorithm: str):
+        # Imported here so python-jose is only loaded when this backend is used
+        from jose import JWTError, jwt
+
+        self._jwt = jwt
+        self._error = JWTError
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    def encode(self, claims):
+        return self._jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token):
+        try:
+            return self._jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except self._error as e:
+            raise TokenError(str(e)) from e
+
+
+class HMACJWTBackend(JWTBackend):
+    def __init__(self, secret_key: str, algorithm: str):
+        if algorithm not in HMAC_ALGORITHMS:
+            raise ValueError(f"HMAC JWT backend does not support {algorithm}")
+        self.algorithm = algorithm
+        self._mac = hmac.new(secret_key.encode(), digestmod=HMAC_ALGORITHMS[algorithm])
+        self._header = _b64encode(orjson.dumps({"alg": algorithm, "typ": "JWT"}))
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims):
+        claims = dict(claims)
+        for claim in _TIME_CLAIMS:
+            if isinstance(claims.get(claim), datetime):
+                claims[claim] = calendar.timegm(claims[claim].utctimetuple())
+
+        signing_input = self._header + b"." + _b64encode(orjson.dumps(claims))
+        return (signing_input + b"." + _b64encode(self._sign(signing_input))).decode()
+
+    def decode(self, token):
+        try:
+            data = token.encode("ascii")
+            signing_input, signature = data.rsplit(b".", 1)
+            header, payload = signing_input.split(b".")
+            if header != self._header:
+                # Issued by another implementation, only the algorithm matters
+                fields = orjson.loads(_b64decode(header))
+                if not isinstance(fields, dict) or fields.get("alg") != self.algorithm:
+                    raise TokenError("The specified alg value is not allowed")
+            if not hmac.compare_digest(self._sign(signing_input), _b64decode(signature)):
+                raise TokenError("Signature verification failed")
+            claims = orjson.loads(_b64decode(payload))
+        except (ValueError, binascii.Error) as e:
+            raise TokenError("Malformed token") from e
+
+        if not isinstance(claims, dict):
+            raise TokenError("Invalid payload")
+        now = time.time()
+        try:
+            if "exp" in claims and now > int(claims["exp"]):
+                raise TokenError("Signature has expired")
+            if "nbf" in claims and now < int(claims["nbf"]):
+                raise TokenError("The token is not yet valid")
+        except (TypeError, ValueError) as e:
+            raise TokenError("Invalid time claim") from e
+        return claims
+
+
+def create_jwt_backend() -> JWTBackend:
+    backend = settings.jwt_backend
+    if backend == "auto":
+        backend = "hmac" if settings.jwt_algorithm in HMAC_ALGORITHMS else "jose"
+    if backend == "hmac":
+        return HMACJWTBackend(settings.jwt_secret_key, settings.jwt_algorithm)
+    if backend == "jose":
+        return JoseJWTBackend(settings.jwt_secret_key, settings.jwt_algorithm)
+    raise ValueError(f"Unknown JWT backend: {backend}")
+
+
+jwt_backend = create_jwt_backend()
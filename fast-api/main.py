@@ -1,61 +1,131 @@
 import random
-from datetime import timedelta
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 
-from fastapi import Depends, FastAPI, HTTPException, status
-from fastapi.responses import PlainTextResponse
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth import (create_access_token, get_current_user, get_password_hash,
-                  verify_password, verify_token)
+from auth import (create_access_token, decode_access_token,
+                  get_admin_user, get_current_user, get_password_hash_async,
+                  shutdown_password_pool, start_password_pool,
+                  verify_password_async, verify_token)
+from compression import CompressionMiddleware
 from config import settings
-from database import engine, get_db
-from models import Base, Post, User
-from schemas import Token
+from database import (engine, get_db, get_read_db, open_read_session,
+                      prewarm_pool, primary_session, stick_to_primary)
+from etags import is_not_modified, make_etag, not_modified
+from export import EXPORT_FIELDS, export_query, ndjson_lines
+from group_commit import signup_batcher
+from metrics import MetricsMiddleware, render_metrics
+from pagination import (CURSOR_FIELDS, SUMMARY_FIELDS, decode_cursor,
+                        encode_cursor, parse_fields, post_columns)
+from posts_cache import posts_cache
+from query_stats import QueryStatsMiddleware
+from repository import (create_user, fetch_posts_page, fetch_posts_version,
+                        fetch_user_by_email, fetch_user_posts)
+from responses import ORJSONResponse, model_response
+from schemas import PostFields, RandomResult, SearchResult, Token
 from schemas import User as UserSchema
-from schemas import UserCreate, UserWithPosts
+from schemas import UserCreate
+from search import (MAX_OFFSET, decode_offset_cursor, encode_offset_cursor,
+                    search_posts)
+from token_cache import CachedUser
+from user_index import user_id_index
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="FastAPI Demo", description="A simple FastAPI project with PostgreSQL")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.run_migrations_at_startup:
+        # Alembic is only imported when migrations run
+        from migrate import upgrade_database
+        upgrade_database()
+    # Forks the bcrypt workers, so before prewarming opens sockets and threads
+    start_password_pool()
+    if settings.database_pool_prewarm:
+        await prewarm_pool()
+    yield
+    if signup_batcher is not None:
+        await signup_batcher.close()
+    shutdown_password_pool()
+
+
+app = FastAPI(
+    lifespan=lifespan,
+    title="FastAPI Demo",
+    description="A simple FastAPI project with PostgreSQL",
+    default_response_class=ORJSONResponse,
+)
+# Compression runs inside the metrics middleware so its time is recorded
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+async def get_user_posts(db: AsyncSession, user_id: int, fields: Tuple[str, ...] = SUMMARY_FIELDS):
+    """Serialized posts of a user, served from the posts cache when possible"""
+    variant = f"fields:{','.join(fields)}"
+    posts = await posts_cache.get(user_id, variant)
+    if posts is None:
+        async with primary_session(db) as primary:
+            posts = await fetch_user_posts(primary, user_id, fields)
+        await posts_cache.set(user_id, posts, variant)
+    return posts
+
+
+async def get_posts_version(db: AsyncSession, user_id: int) -> str:
+    """
+    Validator of a user's posts: the version counter bumped by ORM writes,
+    plus their count and latest updated_at. Cached with the posts, so ORM
+    writes drop it right away; writes made outside the ORM only change it
+    once the cached entry expires, like the cached posts themselves.
+    """
+    cached = await posts_cache.get(user_id, "version")
+    if cached is None:
+        async with primary_session(db) as primary:
+            row = await fetch_posts_version(primary, user_id)
+        version, count, updated_at = row if row is not None else (0, 0, None)
+        cached = [{"version": version, "count": count, "updated_at": str(updated_at)}]
+        await posts_cache.set(user_id, cached, "version")
+    return "{version}:{count}:{updated_at}".format(**cached[0])
 
 
 @app.post("/signup", response_model=UserSchema)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, response: Response, db: AsyncSession = Depends(get_db)):
     """
     Create a new user account with email and password
     """
-    # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+    # Hashed up front so the insert alone detects taken emails, without a
+    # SELECT racing with concurrent signups
+    hashed_password = await get_password_hash_async(user.password)
+    values = {"email": user.email, "name": user.name, "password": hashed_password}
+
+    if signup_batcher is not None:
+        db_user = await signup_batcher.insert(values)
+        if db_user is not None:
+            stick_to_primary(response)
+    else:
+        db_user = await create_user(db, values)
+
+    if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
+    user_id_index.add(db_user["id"])
 
-    # Create new user with hashed password
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        email=user.email,
-        name=user.name,
-        password=hashed_password
-    )
-
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    return db_user
+    return model_response(UserSchema, db_user, response)
 
 
 @app.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     Login endpoint to get JWT token
     """
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+    user = await fetch_user_by_email(db, form_data.username)
+    if not user or not await verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -69,24 +139,27 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@app.get("/random")
-def random_endpoint(db: Session = Depends(get_db)):
+@app.get("/random", response_model=RandomResult)
+async def random_endpoint(
+    fields: Optional[str] = Query(default=None, description="Comma separated post fields to return, add content for full bodies"),
+    db: AsyncSession = Depends(get_read_db),
+):
     """
     Generate random integer 1-1000, create JWT for a random user, decode it, and return user's posts
     """
+    selected = parse_fields(fields)
+
     # Generate random integer from 1-1000
     random_number = random.randint(1, 1000)
 
     # Get a random user from the database
-    users = db.query(User).all()
-    if not users:
+    random_user = await user_id_index.pick(db)
+    if random_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No users found in database"
         )
 
-    random_user = random.choice(users)
-
     # Create JWT token for the random user
     access_token_expires = timedelta(minutes=settings.jwt_access_token_expire_minutes)
     access_token = create_access_token(
@@ -95,8 +168,7 @@ def random_endpoint(db: Session = Depends(get_db)):
 
     # Decode the JWT token to verify it
     try:
-        from jose import jwt
-        payload = jwt.decode(access_token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        payload = decode_access_token(access_token)
         decoded_email = payload.get("sub")
 
         if decoded_email != random_user.email:
@@ -111,9 +183,9 @@ def random_endpoint(db: Session = Depends(get_db)):
         )
 
     # Get all posts for the user
-    user_posts = db.query(Post).filter(Post.user_id == random_user.id).all()
+    user_posts = await get_user_posts(db, random_user.id, selected)
 
-    return {
+    return ORJSONResponse({
         "random_number": random_number,
         "user": {
             "id": random_user.id,
@@ -121,34 +193,165 @@ def random_endpoint(db: Session = Depends(get_db)):
             "email": random_user.email
         },
         "jwt_token": access_token,
-        "posts": [
-            {
-                "id": post.id,
-                "title": post.title,
-                "content": post.content,
-                "created_at": post.created_at,
-                "updated_at": post.updated_at
-            }
-            for post in user_posts
-        ]
-    }
+        "posts": user_posts
+    })
 
 
 @app.get("/users/me", response_model=UserSchema)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(
+    request: Request,
+    response: Response,
+    current_user: CachedUser = Depends(get_current_user),
+):
     """
     Get current user information
+
+    Supports conditional requests with the returned ETag.
     """
-    return current_user
+    etag = make_etag("user", current_user.id, current_user.email, current_user.name, current_user.updated_at)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return model_response(UserSchema, current_user, response)
 
-@app.get("/users/me/posts")
-def read_user_posts(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+
+@app.get("/users/me/posts", response_model=List[PostFields])
+async def read_user_posts(
+    request: Request,
+    limit: int = Query(default=50, ge=1, le=500, description="Maximum number of posts to return"),
+    cursor: Optional[str] = Query(default=None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(default=None, description="Comma separated post fields to return, add content for full bodies"),
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
     """
-    Get all posts for the current user
+    Get a page of posts for the current user, newest first
+
+    The cursor for the next page is returned in the X-Next-Cursor header and
+    is absent on the last page. Supports conditional requests with the
+    returned ETag, answered without loading the posts.
     """
-    posts = db.query(Post).filter(Post.user_id == current_user.id).all()
-    return posts
+    selected = parse_fields(fields)
+    variant = f"page:{cursor or ''}:{limit}:{','.join(selected)}"
+
+    version = await get_posts_version(db, current_user.id)
+    etag = make_etag("posts", current_user.id, version, variant, settings.post_excerpt_length)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    # One extra row tells whether another page follows
+    rows = await posts_cache.get(current_user.id, variant)
+    if rows is None:
+        fields = tuple(sorted(set(selected).union(CURSOR_FIELDS)))
+        async with primary_session(db) as primary:
+            rows = await fetch_posts_page(
+                primary, current_user.id, fields, limit + 1, decode_cursor(cursor) if cursor else None
+            )
+        await posts_cache.set(current_user.id, rows, variant)
+
+    page = rows[:limit]
+    response = ORJSONResponse(
+        [{field: post[field] for field in selected} for post in page],
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+    )
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(page[-1]["created_at"], page[-1]["id"])
+    return response
+
+
+@app.get("/users/me/posts/export", response_class=StreamingResponse)
+async def export_user_posts(
+    request: Request,
+    since: Optional[datetime] = Query(default=None, description="Only export posts updated at or after this time"),
+    after_id: Optional[int] = Query(default=None, description="Resume after this post id, the last one received"),
+    fields: Optional[str] = Query(default=None, description="Comma separated post fields to export, all but the excerpt by default"),
+    current_user: CachedUser = Depends(get_current_user),
+):
+    """
+    Export all posts of the current user as newline delimited JSON, in id order
+
+    The export is streamed with constant memory. Resume an interrupted
+    export by passing the id of the last post received as after_id.
+    """
+    query = export_query(parse_fields(fields, EXPORT_FIELDS), current_user.id, since, after_id)
+    db, _ = open_read_session(request)
+    return StreamingResponse(ndjson_lines(db, query, "user"), media_type="application/x-ndjson")
+
+
+@app.get("/admin/posts/export", response_class=StreamingResponse)
+async def export_all_posts(
+    request: Request,
+    user_id: Optional[int] = Query(default=None, description="Only export the posts of this user"),
+    since: Optional[datetime] = Query(default=None, description="Only export posts updated at or after this time"),
+    after_id: Optional[int] = Query(default=None, description="Resume after this post id, the last one received"),
+    fields: Optional[str] = Query(default=None, description="Comma separated post fields to export, all but the excerpt by default"),
+    admin: CachedUser = Depends(get_admin_user),
+):
+    """
+    Export the posts of every user as newline delimited JSON, in id order
+    (requires one of the ADMIN_EMAILS)
+
+    Like /users/me/posts/export, streamed with constant memory and
+    resumable with after_id.
+    """
+    query = export_query(parse_fields(fields, EXPORT_FIELDS), user_id, since, after_id)
+    db, _ = open_read_session(request)
+    return StreamingResponse(ndjson_lines(db, query, "all"), media_type="application/x-ndjson")
+
+
+async def search_response(db, q: str, user_id: Optional[int], limit: int,
+                          cursor: Optional[str], fields: Optional[str]) -> ORJSONResponse:
+    """A page of search results over the posts of user_id, or of every user when None"""
+    selected = parse_fields(fields)
+    offset = decode_offset_cursor(cursor) if cursor else 0
+
+    # One extra row tells whether another page follows
+    query = search_posts(q, post_columns(selected), engine.dialect.name, limit + 1, offset, user_id)
+    rows = [dict(row) for row in (await db.execute(query)).mappings()]
+
+    response = ORJSONResponse(rows[:limit])
+    if len(rows) > limit and offset + limit <= MAX_OFFSET:
+        response.headers["X-Next-Cursor"] = encode_offset_cursor(offset + limit)
+    return response
+
+
+@app.get("/posts/search", response_model=List[SearchResult])
+async def search_posts_endpoint(
+    q: str = Query(min_length=1, max_length=200, description="Words to search post titles and content for"),
+    limit: int = Query(default=20, ge=1, le=100, description="Maximum number of posts to return"),
+    cursor: Optional[str] = Query(default=None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(default=None, description="Comma separated post fields to return, add content for full bodies"),
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Full-text search over the current user's posts, best matches first
+
+    Every post is returned with its rank. The cursor for the next page is
+    returned in the X-Next-Cursor header and is absent on the last page.
+    """
+    return await search_response(db, q, current_user.id, limit, cursor, fields)
+
+
+@app.get("/admin/posts/search", response_model=List[SearchResult])
+async def search_all_posts(
+    q: str = Query(min_length=1, max_length=200, description="Words to search post titles and content for"),
+    user_id: Optional[int] = Query(default=None, description="Only search the posts of this user"),
+    limit: int = Query(default=20, ge=1, le=100, description="Maximum number of posts to return"),
+    cursor: Optional[str] = Query(default=None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(default=None, description="Comma separated post fields to return, add content for full bodies"),
+    admin: CachedUser = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Full-text search over the posts of every user, best matches first
+    (requires one of the ADMIN_EMAILS)
+
+    Like /posts/search, over the posts of user_id when given.
+    """
+    return await search_response(db, q, user_id, limit, cursor, fields)
 
 
 @app.get("/")
@@ -156,6 +359,11 @@ def read_root():
     return {"message": "Welcome to FastAPI Demo", "docs": "/docs"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/loaderio-1169617544508734aa5dc4919f421add/", response_class=PlainTextResponse)
 def loaderio():
     return "loaderio-1169617544508734aa5dc4919f421add"
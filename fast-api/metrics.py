@@ -0,0 +1,243 @@
+"""
+Request metrics exposed in the Prometheus text format
+
+MetricsMiddleware records request counts and latency histograms per route and
+how much of each request was spent in the database, bcrypt, JWT handling and
+response serialization. Engines passed to instrument_engine also report
+connection pool checkouts, overflow and checkout wait time. Metrics are kept
+per process.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds spent per component in the current request
+_request_components: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_components", default=None)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # Per-bucket counts, then the sum and count of observations
+                series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {series[-1]}"
+
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_request_component_seconds = Histogram(
+    "http_request_component_seconds",
+    "Time spent per request in the database, bcrypt, JWT handling and serialization",
+    ("route", "component"),
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries",
+    "SQL statements run per request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+posts_exported_total = Counter(
+    "posts_exported_total", "Posts written by the streaming exports", ("export",)
+)
+db_pool_checkouts_total = Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool", ("engine",)
+)
+db_pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection", ("engine",)
+)
+
+_engines: Dict[str, object] = {}
+
+
+@contextmanager
+def track(component: str):
+    """Add the time spent in the block to the current request's component total"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        components = _request_components.get()
+        if components is not None:
+            components[component] = components.get(component, 0.0) + time.perf_counter() - start
+
+
+class _TimedPoolMixin:
+    engine_label = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait_seconds.observe(time.perf_counter() - start, self.engine_label)
+
+
+def timed_pool_class(url, label: str):
+    """Pool class the dialect would use for url, extended to time checkouts if it is a queue pool"""
+    pool_class = url.get_dialect().get_pool_class(url)
+    if not issubclass(pool_class, QueuePool):
+        return pool_class
+    return type(f"Timed{pool_class.__name__}", (_TimedPoolMixin, pool_class), {"engine_label": label})
+
+
+def instrument_engine(engine, label: str):
+    """Time every statement of the engine and count pool checkouts"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    _engines[label] = sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        components = _request_components.get()
+        if components is not None:
+            components["db"] = components.get("db", 0.0) + elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # Failed statements never reach after_cursor_execute, their time still counts
+        connection = exception_context.connection
+        if connection is None or not connection.info.get("metrics_query_start"):
+            return
+        elapsed = time.perf_counter() - connection.info["metrics_query_start"].pop()
+        components = _request_components.get()
+        if components is not None:
+            components["db"] = components.get("db", 0.0) + elapsed
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts_total.inc(label)
+
+
+def _pool_gauges():
+    yield "# HELP db_pool_connections Connections of the pool by state"
+    yield "# TYPE db_pool_connections gauge"
+    for label, engine in sorted(_engines.items()):
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        yield f'db_pool_connections{{engine="{label}",state="checked_out"}} {pool.checkedout()}'
+        yield f'db_pool_connections{{engine="{label}",state="checked_in"}} {pool.checkedin()}'
+        yield f'db_pool_connections{{engine="{label}",state="overflow"}} {max(pool.overflow(), 0)}'
+        yield f'db_pool_connections{{engine="{label}",state="size"}} {pool.size()}'
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in (
+        http_requests_total,
+        http_request_duration_seconds,
+        http_request_component_seconds,
+        http_request_db_queries,
+        posts_exported_total,
+        db_pool_checkouts_total,
+        db_pool_wait_seconds,
+    ):
+        lines.extend(metric.render())
+    lines.extend(_pool_gauges())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        components: Dict[str, float] = {}
+        token = _request_components.set(components)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_components.reset(token)
+
+            # Label by route template to keep the number of series bounded
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+
+            http_requests_total.inc(method, path, str(status_code))
+            http_request_duration_seconds.observe(elapsed, method, path)
+            for component, seconds in components.items():
+                http_request_component_seconds.observe(seconds, path, component)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Apply the Alembic migrations to the configured database
+
+Equivalent to ``alembic upgrade head`` and used by the application at
+startup outside production or when DATABASE_AUTO_MIGRATE is enabled.
+"""
+
+import os
+
+from alembic import command
+from alembic.config import Config
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def upgrade_database(revision: str = "head", configure_logger: bool = False):
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    config.attributes["configure_logger"] = configure_logger
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    upgrade_database(configure_logger=True)
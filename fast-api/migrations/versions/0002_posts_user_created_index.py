@@ -0,0 +1,44 @@
+"""add posts (user_id, created_at desc, id) index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    indexes = sa.inspect(op.get_bind()).get_indexes('posts')
+    if any(index['name'] == 'ix_posts_user_id_created_at_id' for index in indexes):
+        return
+
+    # Build the index without blocking writes on PostgreSQL, which needs to
+    # happen outside the migration transaction.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_posts_user_id_created_at_id',
+            'posts',
+            ['user_id', sa.text('created_at DESC'), 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_posts_user_id_created_at_id',
+            table_name='posts',
+            postgresql_concurrently=True,
+        )
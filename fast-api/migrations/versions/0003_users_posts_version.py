@@ -0,0 +1,34 @@
+"""add users.posts_version
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 13:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = sa.inspect(op.get_bind()).get_columns('users')
+    if any(column['name'] == 'posts_version' for column in columns):
+        return
+
+    op.add_column(
+        'users',
+        sa.Column('posts_version', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('posts_version')
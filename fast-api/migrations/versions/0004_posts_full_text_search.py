@@ -0,0 +1,88 @@
+"""add full-text search over posts
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:40:00.000000
+
+PostgreSQL gets a generated tsvector column over the title (weight A) and
+content (weight B) with a GIN index. SQLite gets an external content FTS5
+table kept in sync with posts by triggers.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+
+SQLITE_TRIGGERS = {
+    'posts_fts_insert': """
+        CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    """,
+    'posts_fts_delete': """
+        CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        END
+    """,
+    'posts_fts_update': """
+        CREATE TRIGGER posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO posts_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    """,
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        columns = sa.inspect(bind).get_columns('posts')
+        if not any(column['name'] == 'search_vector' for column in columns):
+            # Computing the column rewrites the table once
+            op.add_column(
+                'posts',
+                sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True)),
+            )
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_posts_search_vector',
+                'posts',
+                ['search_vector'],
+                postgresql_using='gin',
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+            "title, content, content='posts', content_rowid='id', tokenize='porter unicode61')"
+        )
+        for name, sql in SQLITE_TRIGGERS.items():
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+            op.execute(sql)
+        op.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_posts_search_vector', table_name='posts', postgresql_concurrently=True)
+        op.drop_column('posts', 'search_vector')
+    elif bind.dialect.name == 'sqlite':
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS posts_fts")
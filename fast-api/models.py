@@ -1,10 +1,44 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import (Column, DateTime, ForeignKey, Index, Integer, String,
+                        Text, TypeDecorator, event, inspect, update)
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import (Session, column_property, deferred, object_session,
+                            relationship)
 from sqlalchemy.sql import func
 
+from config import settings
 from database import Base
 
 
+class _SQLiteTimestamp(sqlite.DATETIME):
+    """
+    Writes datetimes the way SQLite's CURRENT_TIMESTAMP does,
+    'YYYY-MM-DD HH:MM:SS', with microseconds only when there are any.
+    SQLite compares them as strings, so bound values like keyset cursors
+    have to match the server default's format: with the stock
+    '.000000' suffix every row of the same second sorts before the cursor.
+    """
+
+    def bind_processor(self, dialect):
+        def process(value):
+            if value is None:
+                return None
+            if value.microsecond:
+                return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        return process
+
+
+class Timestamp(TypeDecorator):
+    """Timezone aware DateTime, stored in CURRENT_TIMESTAMP's format on SQLite"""
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(_SQLiteTimestamp())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -12,10 +46,13 @@ class User(Base):
     name = Column(String(255), nullable=False)
     email = Column(String(255), nullable=False, unique=True, index=True)
     password = Column(String(255), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Bumped whenever one of the user's posts changes through the ORM, used in ETags
+    posts_version = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
 
-    posts = relationship("Post", back_populates="user")
+    # Loading posts one user at a time is an N+1 query, use selectinload() instead
+    posts = relationship("Post", back_populates="user", lazy="raise_on_sql")
 
 
 class Post(Base):
@@ -24,8 +61,57 @@ class Post(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String(255), nullable=False)
-    content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Loaded only when accessed or selected explicitly, listings use the excerpt
+    content = deferred(Column(Text, nullable=False))
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
+
+    user = relationship("User", back_populates="posts", lazy="raise_on_sql")
+
+
+# Leading characters of the content, computed by the database
+Post.excerpt = column_property(func.substr(Post.content, 1, settings.post_excerpt_length))
+
+# Serves the per-user post listings, newest first, including keyset pages
+Index("ix_posts_user_id_created_at_id", Post.user_id, Post.created_at.desc(), Post.id)
+
+
+# Session.info keys collecting the users whose posts changed, in the current
+# flush and in the whole transaction. The posts version is bumped per flush,
+# caches of the posts are invalidated once the transaction commits.
+FLUSH_CHANGED_POSTS_KEY = "flush_changed_posts_users"
+CHANGED_POSTS_KEY = "changed_posts_users"
+
+
+@event.listens_for(Post, "after_insert")
+@event.listens_for(Post, "after_update")
+@event.listens_for(Post, "after_delete")
+def _record_changed_posts(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    changed = session.info.setdefault(FLUSH_CHANGED_POSTS_KEY, set())
+    changed.add(target.user_id)
+    # A post moved to another user changes the previous owner's posts too
+    changed.update(inspect(target).attrs.user_id.history.deleted)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_posts_version(session, flush_context):
+    user_ids = session.info.pop(FLUSH_CHANGED_POSTS_KEY, None)
+    if not user_ids:
+        return
+    session.info.setdefault(CHANGED_POSTS_KEY, set()).update(user_ids)
+    users = User.__table__
+    session.connection().execute(
+        update(users)
+        .where(users.c.id.in_(user_ids))
+        # Keeping updated_at stops its onupdate default, the user row itself didn't change
+        .values(posts_version=users.c.posts_version + 1, updated_at=users.c.updated_at)
+    )
+
 
-    user = relationship("User", back_populates="posts")
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_posts(session):
+    session.info.pop(FLUSH_CHANGED_POSTS_KEY, None)
+    session.info.pop(CHANGED_POSTS_KEY, None)
@@ -0,0 +1,77 @@
+"""
+Keyset pagination helpers for post listings
+
+Posts are ordered by ``created_at`` descending and then ``id`` ascending,
+matching the ``(user_id, created_at DESC, id)`` posts index. A cursor
+encodes the sort key of the last post of a page, so every page is an index
+range scan no matter how deep it is.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+from models import Post
+
+POST_FIELDS = ("id", "user_id", "title", "excerpt", "content", "created_at", "updated_at")
+
+# Fields returned when none are requested; the full content is opt-in
+SUMMARY_FIELDS = ("id", "user_id", "title", "excerpt", "created_at", "updated_at")
+
+# Columns every page query selects to be able to build the next cursor
+CURSOR_FIELDS = ("id", "created_at")
+
+
+def post_columns(fields):
+    """Post columns to select for the given fields, skipping ORM instance loading"""
+    return [getattr(Post, field) for field in fields]
+
+
+def parse_fields(fields: Optional[str], default: Tuple[str, ...] = SUMMARY_FIELDS) -> Tuple[str, ...]:
+    """Validate a comma separated fields parameter, returning fields in their canonical order"""
+    if not fields:
+        return default
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(POST_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown post fields: {', '.join(sorted(unknown))}"
+        )
+    return tuple(field for field in POST_FIELDS if field in requested)
+
+
+def encode_cursor(created_at, post_id: int) -> str:
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, post_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, post_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def after_cursor(created_at: datetime, post_id: int):
+    """Filter selecting the posts that sort after the given position"""
+    return or_(
+        Post.created_at < created_at,
+        and_(Post.created_at == created_at, Post.id > post_id),
+    )
+
+
+def page_order():
+    return Post.created_at.desc(), Post.id
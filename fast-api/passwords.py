@@ -0,0 +1,24 @@
+"""
+Password hashing helpers
+
+Kept free of application imports so the password process pool workers only
+have to load passlib. passlib itself is imported on first use, which keeps it
+out of application start up.
+"""
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def verify_password(plain_password, hashed_password):
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+def get_password_hash(password):
+    return get_pwd_context().hash(password)
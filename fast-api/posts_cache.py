@@ -0,0 +1,212 @@
+"""
+Cache of serialized post lists keyed by user id
+
+Each user has one cache entry holding one or more variants of their posts
+(for example different pages). Any ORM insert, update or delete of a Post
+invalidates the whole entry of the affected users once the transaction
+commits. Writes that bypass the ORM, such as bulk loads, are only picked up
+when the entry expires.
+"""
+
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from cache import LRUCache
+from config import settings
+from models import CHANGED_POSTS_KEY
+
+
+def estimate_size(posts: List[Dict[str, Any]]) -> int:
+    """Rough memory footprint of a serialized post list in bytes"""
+    size = sys.getsizeof(posts)
+    for post in posts:
+        size += 64 * len(post)
+        for value in post.values():
+            if isinstance(value, str):
+                size += len(value)
+    return size
+
+
+class PostsCache:
+    """Interface shared by the cache backends"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, user_id: int, variant: str = "all") -> Optional[List[Dict[str, Any]]]:
+        raise NotImplementedError
+
+    async def set(self, user_id: int, posts: List[Dict[str, Any]], variant: str = "all"):
+        raise NotImplementedError
+
+    def invalidate(self, user_id: int):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _record(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+
+class NullPostsCache(PostsCache):
+    """Backend used when caching is disabled, every lookup misses"""
+
+    async def get(self, user_id, variant="all"):
+        return self._record(None)
+
+    async def set(self, user_id, posts, variant="all"):
+        pass
+
+    def invalidate(self, user_id):
+        pass
+
+
+class LocalPostsCache(PostsCache):
+    """In-process LRU bounded by the estimated size of the cached posts"""
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, ttl: float):
+        super().__init__()
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = LRUCache(
+            maxsize=sys.maxsize,
+            ttl=ttl,
+            max_weight=max_bytes,
+            weigh=lambda variants: sum(size for _, size in variants.values()),
+        )
+
+    async def get(self, user_id, variant="all"):
+        variants = self._entries.get(user_id)
+        return self._record(variants[variant][0] if variants and variant in variants else None)
+
+    async def set(self, user_id, posts, variant="all"):
+        size = estimate_size(posts)
+        if size > self.max_entry_bytes:
+            return
+        variants = dict(self._entries.get(user_id) or {})
+        variants[variant] = (posts, size)
+        self._entries.set(user_id, variants)
+
+    def invalidate(self, user_id):
+        self._entries.pop(user_id)
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "evictions": self._entries.evictions,
+            "entries": len(self._entries),
+            "bytes": self._entries.weight,
+        }
+
+
+class SharedPostsCache(PostsCache):
+    """
+    Stores orjson encoded posts in a key-value store shared by all workers.
+
+    ``client`` needs the redis-py ``hget``/``hset``/``expire``/``delete``
+    methods; each user is one hash with a field per variant, so
+    invalidation is a single ``delete``.
+    """
+
+    def __init__(self, client, max_entry_bytes: int, ttl: int, prefix: str = "posts:"):
+        super().__init__()
+        self.client = client
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, user_id):
+        return f"{self.prefix}{user_id}"
+
+    async def get(self, user_id, variant="all"):
+        raw = await run_in_threadpool(self.client.hget, self._key(user_id), variant)
+        return self._record(None if raw is None else orjson.loads(raw))
+
+    async def set(self, user_id, posts, variant="all"):
+        data = orjson.dumps(posts)
+        if len(data) > self.max_entry_bytes:
+            return
+
+        def store():
+            key = self._key(user_id)
+            self.client.hset(key, variant, data)
+            self.client.expire(key, self.ttl)
+
+        await run_in_threadpool(store)
+
+    def invalidate(self, user_id):
+        self.client.delete(self._key(user_id))
+
+
+class InMemoryHashStore:
+    """Local stand-in for the shared store, implements the subset of redis-py used above"""
+
+    def __init__(self):
+        self._hashes: Dict[str, Dict[str, bytes]] = {}
+        self._expiry: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def hget(self, name, key):
+        with self._lock:
+            if self._expiry.get(name, float("inf")) <= time.time():
+                self._hashes.pop(name, None)
+                self._expiry.pop(name, None)
+            return self._hashes.get(name, {}).get(key)
+
+    def hset(self, name, key, value):
+        with self._lock:
+            self._hashes.setdefault(name, {})[key] = value
+
+    def expire(self, name, seconds):
+        with self._lock:
+            self._expiry[name] = time.time() + seconds
+
+    def delete(self, *names):
+        with self._lock:
+            for name in names:
+                self._hashes.pop(name, None)
+                self._expiry.pop(name, None)
+
+
+def create_posts_cache() -> PostsCache:
+    backend = settings.posts_cache_backend
+    if backend == "none":
+        return NullPostsCache()
+    if backend == "local":
+        return LocalPostsCache(
+            max_bytes=settings.posts_cache_max_bytes,
+            max_entry_bytes=settings.posts_cache_max_entry_bytes,
+            ttl=settings.posts_cache_ttl_seconds,
+        )
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("POSTS_CACHE_BACKEND=redis requires the redis package")
+        return SharedPostsCache(
+            redis.Redis.from_url(settings.posts_cache_url),
+            max_entry_bytes=settings.posts_cache_max_entry_bytes,
+            ttl=settings.posts_cache_ttl_seconds,
+        )
+    raise ValueError(f"Unknown posts cache backend: {backend}")
+
+
+posts_cache = create_posts_cache()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_posts(session):
+    for user_id in session.info.pop(CHANGED_POSTS_KEY, ()):
+        posts_cache.invalidate(user_id)
@@ -0,0 +1,163 @@
+"""
+Per-request SQL statistics
+
+QueryStatsMiddleware counts the statements every request runs and the time
+they take. Statements slower than DATABASE_SLOW_QUERY_MS are logged together
+with the route that ran them. The same statement running
+DATABASE_REPEATED_QUERY_THRESHOLD times within one request, the usual sign
+of an N+1 query, is logged or raised as RepeatedQueryError depending on
+DATABASE_REPEATED_QUERY_MODE.
+
+Tests can assert query budgets per endpoint with count_queries, which
+collects the statements of every request finishing inside the block:
+
+    with count_queries() as stats:
+        client.get("/users/me/posts", headers=headers)
+    assert stats.count <= 2
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from config import settings
+from metrics import http_request_db_queries
+
+logger = logging.getLogger(__name__)
+
+REPEATED_QUERY_MODES = ("off", "warn", "raise")
+
+_request_stats: ContextVar[Optional["QueryStats"]] = ContextVar("request_query_stats", default=None)
+
+# QueryStats of the active count_queries blocks
+_collectors: List["QueryStats"] = []
+_collectors_lock = threading.Lock()
+
+
+class RepeatedQueryError(Exception):
+    """The same statement ran too often within one request"""
+
+
+class QueryStats:
+    """Statements run and time spent in the database by one request"""
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return "outside a request"
+        # Routing happens after the middleware, so the route is looked up late
+        route = getattr(self.scope.get("route"), "path", self.scope.get("path"))
+        return f"{self.scope.get('method')} {route}"
+
+    def merge(self, other: "QueryStats"):
+        self.count += other.count
+        self.seconds += other.seconds
+        self.statements.update(other.statements)
+
+
+def _shorten(statement: str) -> str:
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+def _record(stats: QueryStats, statement: str):
+    stats.count += 1
+    stats.statements[statement] += 1
+    repeats = stats.statements[statement]
+
+    mode = settings.database_repeated_query_mode
+    # Flagged once per statement and request, when it reaches the threshold
+    if mode == "off" or repeats != settings.database_repeated_query_threshold:
+        return
+    message = f"Statement ran {repeats} times in {stats.route}, likely an N+1 query: {_shorten(statement)}"
+    if mode == "raise":
+        raise RepeatedQueryError(message)
+    logger.warning(message)
+
+
+def instrument_queries(engine):
+    """Count, time and check every statement the engine runs"""
+    if settings.database_repeated_query_mode not in REPEATED_QUERY_MODES:
+        raise ValueError(f"Unknown repeated query mode: {settings.database_repeated_query_mode}")
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _request_stats.get()
+        if stats is not None:
+            _record(stats, statement)
+        conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_stats_start"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.seconds += elapsed
+
+        # Parameters are left out, they may hold passwords and other personal data
+        if settings.database_slow_query_ms and elapsed * 1000 >= settings.database_slow_query_ms:
+            route = stats.route if stats is not None else "outside a request"
+            logger.warning("Slow query (%.1f ms) in %s: %s", elapsed * 1000, route, _shorten(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # Failed statements never reach after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_stats_start"):
+            connection.info["query_stats_start"].pop()
+
+
+@contextmanager
+def count_queries():
+    """
+    Collect the statements of requests finishing inside the block, and of
+    statements run directly by the calling code
+    """
+    stats = QueryStats()
+    with _collectors_lock:
+        _collectors.append(stats)
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+        with _collectors_lock:
+            _collectors.remove(stats)
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware giving every request its own QueryStats"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope)
+        token = _request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_stats.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_db_queries.observe(stats.count, route)
+            if _collectors:
+                with _collectors_lock:
+                    for collector in _collectors:
+                        collector.merge(stats)
@@ -0,0 +1,114 @@
+"""
+Hot user and post lookups
+
+The statements run on almost every request are built once with bind
+parameters instead of per call. A pre-built statement memoizes its cache
+key, so executing it skips statement construction and cache key generation
+and goes straight to SQLAlchemy's compiled cache. Its SQL text never
+changes either, so asyncpg reuses the statement it prepared server side on
+each connection, and sqlite3 its per-connection statement cache. Statements
+that depend on the requested fields are built once per field combination.
+
+Users are created with a single INSERT ... ON CONFLICT DO NOTHING RETURNING,
+so a taken email is detected by the insert itself rather than by a SELECT
+that races with concurrent signups.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import engine
+from models import Post, User
+from pagination import after_cursor, page_order, post_columns
+
+_user_by_email = select(User).where(User.email == bindparam("email")).limit(1)
+
+_posts_version = select(
+    User.posts_version,
+    select(func.count(Post.id)).where(Post.user_id == bindparam("user_id")).scalar_subquery(),
+    select(func.max(Post.updated_at)).where(Post.user_id == bindparam("user_id")).scalar_subquery(),
+).where(User.id == bindparam("user_id"))
+
+
+# Dialects with INSERT ... ON CONFLICT ... RETURNING
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+@lru_cache(maxsize=None)
+def _insert_user(dialect_name: str):
+    if dialect_name not in _INSERTS:
+        raise ValueError(f"Creating users is not supported on {dialect_name}")
+    users = User.__table__
+    return (
+        _INSERTS[dialect_name](users)
+        .on_conflict_do_nothing(index_elements=[users.c.email])
+        .returning(users.c.id, users.c.email, users.c.name, users.c.created_at, users.c.updated_at)
+    )
+
+
+@lru_cache(maxsize=256)
+def _user_posts(fields: Tuple[str, ...]):
+    return select(*post_columns(fields)).where(Post.user_id == bindparam("user_id"))
+
+
+@lru_cache(maxsize=256)
+def _posts_page(fields: Tuple[str, ...], after: bool):
+    query = select(*post_columns(fields)).where(Post.user_id == bindparam("user_id"))
+    if after:
+        query = query.where(after_cursor(bindparam("cursor_created_at"), bindparam("cursor_id")))
+    return query.order_by(*page_order()).limit(bindparam("limit"))
+
+
+async def fetch_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(_user_by_email, {"email": email})
+
+
+async def fetch_posts_version(db: AsyncSession, user_id: int) -> Optional[tuple]:
+    """The user's posts version counter, post count and latest post updated_at"""
+    return (await db.execute(_posts_version, {"user_id": user_id})).one_or_none()
+
+
+async def fetch_user_posts(db: AsyncSession, user_id: int, fields: Tuple[str, ...]) -> List[dict]:
+    """All posts of a user as row mappings of the given fields"""
+    result = await db.execute(_user_posts(fields), {"user_id": user_id})
+    return [dict(row) for row in result.mappings()]
+
+
+async def fetch_posts_page(db: AsyncSession, user_id: int, fields: Tuple[str, ...], limit: int,
+                           cursor: Optional[tuple] = None) -> List[dict]:
+    """Up to limit posts of a user in page order, starting after a decoded cursor"""
+    params = {"user_id": user_id, "limit": limit}
+    if cursor is not None:
+        params["cursor_created_at"], params["cursor_id"] = cursor
+    result = await db.execute(_posts_page(fields, cursor is not None), params)
+    return [dict(row) for row in result.mappings()]
+
+
+def _create_users(session, users):
+    # Inserted and committed in one call so the write lock, which is
+    # database-wide on SQLite, is never held while waiting for a thread
+    result = session.execute(_insert_user(engine.dialect.name), users)
+    created = {row["email"]: dict(row) for row in result.mappings()}
+    session.commit()
+    return created
+
+
+async def create_user(db: AsyncSession, values: dict) -> Optional[dict]:
+    """Insert and commit a user with email, name and password, returning None if the email is taken"""
+    created = await db.run_sync(_create_users, [values])
+    return created.get(values["email"])
+
+
+async def create_users(db: AsyncSession, users: List[dict]) -> Dict[str, dict]:
+    """
+    Insert users in one multi-row statement and commit, returning the
+    created users by email. Users whose email is taken are left out.
+    """
+    return await db.run_sync(_create_users, users)
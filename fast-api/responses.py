@@ -0,0 +1,53 @@
+"""
+Response classes used by the application
+"""
+
+from functools import lru_cache
+from typing import Mapping, Optional, Tuple, Type
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse
+from pydantic import BaseModel
+
+from metrics import track
+
+
+class ORJSONResponse(BaseORJSONResponse):
+    """
+    orjson encoded response that reports its encoding time as the
+    serialization component. Handlers that return an instance directly also
+    skip FastAPI's jsonable_encoder pass; orjson encodes datetimes itself.
+    """
+
+    def render(self, content) -> bytes:
+        with track("serialization"):
+            return super().render(content)
+
+
+@lru_cache(maxsize=None)
+def _field_names(model: Type[BaseModel]) -> Tuple[str, ...]:
+    return tuple(model.model_fields)
+
+
+def model_response(model: Type[BaseModel], data, response: Optional[Response] = None) -> ORJSONResponse:
+    """
+    Respond with the fields of model taken from data, a row or object loaded
+    from our own database, without validating them again.
+
+    FastAPI validates and re-encodes whatever a handler returns against its
+    response_model unless it is a Response, so handlers keep the model as
+    response_model for the docs and return this instead. Like model_construct,
+    only the model's fields are picked, in its order. Headers, cookies and the
+    status code set on the handler's response parameter are carried over.
+    """
+    if isinstance(data, Mapping):
+        content = {name: data[name] for name in _field_names(model)}
+    else:
+        content = {name: getattr(data, name) for name in _field_names(model)}
+
+    result = ORJSONResponse(content)
+    if response is not None:
+        if response.status_code:
+            result.status_code = response.status_code
+        result.headers.raw.extend(response.headers.raw)
+    return result
@@ -1,14 +1,35 @@
 #!/usr/bin/env python3
 """
 Startup script for the FastAPI application
+
+In development a single uvicorn process serves the app, reloading on code
+changes when DEBUG is set. With ENVIRONMENT=production gunicorn supervises
+SERVER_WORKERS uvicorn workers: crashed or silent workers are replaced,
+workers are recycled after SERVER_MAX_REQUESTS requests, and SIGHUP restarts
+them gracefully.
 """
 
+import os
+
 import uvicorn
 
 from config import settings
-from main import app
 
-if __name__ == "__main__":
+try:
+    from uvicorn.workers import UvicornWorker
+except ImportError:
+    # uvicorn.workers needs gunicorn, which is only used in production
+    UvicornWorker = None
+
+if UvicornWorker is not None:
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {
+            "loop": settings.server_loop,
+            "http": settings.server_http,
+        }
+
+
+def run_development():
     uvicorn.run(
         "main:app",
         host=settings.host,
@@ -16,3 +37,48 @@ if __name__ == "__main__":
         reload=settings.debug,
         log_level="info"
     )
+
+
+def run_production():
+    if UvicornWorker is None:
+        raise RuntimeError("ENVIRONMENT=production requires the gunicorn package")
+    from gunicorn.app.base import BaseApplication
+
+    # Every worker runs its own bcrypt pool, share the CPUs between them.
+    # Workers are forked from this process and keep its settings object, so
+    # the share is set on it rather than in the environment.
+    if "password_hash_workers" not in settings.model_fields_set:
+        settings.password_hash_workers = max(1, (os.cpu_count() or 1) // settings.server_workers)
+
+    options = {
+        "bind": f"{settings.host}:{settings.port}",
+        "workers": settings.server_workers,
+        "worker_class": "run.Worker",
+        "keepalive": settings.server_keepalive,
+        "backlog": settings.server_backlog,
+        "max_requests": settings.server_max_requests,
+        "max_requests_jitter": settings.server_max_requests_jitter,
+        "timeout": settings.server_timeout,
+        "graceful_timeout": settings.server_graceful_timeout,
+        "loglevel": "info",
+        "accesslog": "-" if settings.debug else None,
+    }
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Workers import the app themselves after forking
+            from main import app
+            return app
+
+    Application().run()
+
+
+if __name__ == "__main__":
+    if settings.environment == "production":
+        run_production()
+    else:
+        run_development()
@@ -41,6 +41,34 @@ class Post(PostBase):
         from_attributes = True
 
 
+class PostFields(BaseModel):
+    """A post as listed by the read endpoints, with only the requested fields"""
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    title: Optional[str] = None
+    excerpt: Optional[str] = None
+    content: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class SearchResult(PostFields):
+    rank: float
+
+
+class UserSummary(BaseModel):
+    id: int
+    name: str
+    email: EmailStr
+
+
+class RandomResult(BaseModel):
+    random_number: int
+    user: UserSummary
+    jwt_token: str
+    posts: List[PostFields]
+
+
 class UserWithPosts(User):
     posts: List[Post] = []
 
@@ -52,3 +80,4 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    exp: Optional[int] = None
@@ -0,0 +1,79 @@
+"""
+Full-text search over posts
+
+On PostgreSQL posts are matched against the generated ``search_vector``
+column (GIN indexed) with ``websearch_to_tsquery`` and ranked with
+``ts_rank_cd``. On SQLite the ``posts_fts`` FTS5 table is used and ranked
+with bm25. Titles weigh more than content on both. Ranked results are
+paged by offset, bounded by MAX_OFFSET.
+"""
+
+import base64
+import json
+import re
+
+from fastapi import HTTPException, status
+from sqlalchemy import column, false, func, literal_column, select, table
+
+from models import Post
+
+# Text search configuration used by the search_vector column
+SEARCH_CONFIG = "english"
+
+# Deepest result reachable through cursors, ranking all matches gets slower with depth
+MAX_OFFSET = 1000
+
+posts_fts = table("posts_fts", column("rowid"))
+
+
+def fts5_query(q: str) -> str:
+    """Turn free text into an FTS5 query matching all of its words, without FTS5 syntax"""
+    words = re.findall(r"\w+", q)
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_posts(q: str, columns, dialect_name: str, limit: int, offset: int = 0, user_id=None):
+    """Select statement returning the columns and a rank, best matches first"""
+    if dialect_name == "postgresql":
+        vector = literal_column("posts.search_vector")
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        rank = func.ts_rank_cd(vector, tsquery)
+        query = select(*columns, rank.label("rank")).where(vector.op("@@")(tsquery))
+        order = (rank.desc(), Post.id)
+    elif dialect_name == "sqlite":
+        # bm25 is lower for better matches, negated so higher ranks are better everywhere
+        bm25 = func.bm25(literal_column("posts_fts"), 2.0, 1.0)
+        match = fts5_query(q)
+        query = (
+            select(*columns, (-bm25).label("rank"))
+            .join_from(Post, posts_fts, posts_fts.c.rowid == Post.id)
+            # Without any words there is nothing to match, like websearch_to_tsquery
+            .where(literal_column("posts_fts").match(match) if match else false())
+        )
+        order = (bm25, Post.id)
+    else:
+        raise ValueError(f"Full-text search is not supported on {dialect_name}")
+
+    if user_id is not None:
+        query = query.where(Post.user_id == user_id)
+    return query.order_by(*order).limit(limit).offset(offset)
+
+
+def encode_offset_cursor(offset: int) -> str:
+    raw = json.dumps([offset], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        (offset,) = json.loads(raw)
+        offset = int(offset)
+    except (ValueError, TypeError):
+        offset = -1
+    if not 0 <= offset <= MAX_OFFSET:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return offset
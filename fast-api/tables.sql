@@ -1,17 +1,33 @@
-CREATE TABLE IF NOT EXISTS USERS (
-    ID SERIAL PRIMARY KEY,
-    NAME VARCHAR(255) NOT NULL,
-    EMAIL VARCHAR(255) NOT NULL UNIQUE,
-    PASSWORD VARCHAR(255) NOT NULL,
-    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UPDATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+-- Reference PostgreSQL schema matching models.py.
+-- The schema is managed by Alembic (see migrations/), apply it with:
+--     alembic upgrade head
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    posts_version INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
 );
 
-CREATE TABLE IF NOT EXISTS POSTS (
-    ID SERIAL PRIMARY KEY,
-    USER_ID INT NOT NULL REFERENCES USERS(ID),
-    TITLE VARCHAR(255) NOT NULL,
-    CONTENT TEXT NOT NULL,
-    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UPDATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email);
+CREATE INDEX IF NOT EXISTS ix_users_id ON users (id);
+
+CREATE TABLE IF NOT EXISTS posts (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    title VARCHAR(255) NOT NULL,
+    content TEXT NOT NULL,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
 );
+
+CREATE INDEX IF NOT EXISTS ix_posts_id ON posts (id);
+CREATE INDEX IF NOT EXISTS ix_posts_user_id_created_at_id ON posts (user_id, created_at DESC, id);
+CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING gin (search_vector);
@@ -0,0 +1,86 @@
+"""
+Shared fixtures: one app and database for the test run, emptied after every test
+
+Settings are read at import time, so the environment is set up before any
+application module is imported. Point DATABASE_URL at PostgreSQL or set
+DATABASE_ASYNC=true to run the suite against those instead.
+"""
+
+import os
+import tempfile
+from datetime import timedelta
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("HOST", "127.0.0.1")
+os.environ.setdefault("PORT", "8000")
+os.environ.setdefault("DEBUG", "false")
+# bcrypt runs in the threadpool, no process pool per test run
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+# N+1 queries fail the request instead of being logged
+os.environ.setdefault("DATABASE_REPEATED_QUERY_MODE", "raise")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete, insert, select  # noqa: E402
+
+from auth import create_access_token  # noqa: E402
+from database import engine  # noqa: E402
+from main import app  # noqa: E402
+from models import Post, User  # noqa: E402
+from passwords import get_password_hash  # noqa: E402
+from posts_cache import posts_cache  # noqa: E402
+from token_cache import token_cache  # noqa: E402
+
+PASSWORD = "password123"
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def password_hash():
+    return get_password_hash(PASSWORD)
+
+
+@pytest.fixture(autouse=True)
+def clean_database(client):
+    yield
+    with engine.begin() as conn:
+        # Ids are reused once the rows are gone, so nothing cached for them may survive
+        for user_id in conn.execute(select(User.id)).scalars():
+            posts_cache.invalidate(user_id)
+        conn.execute(delete(Post))
+        conn.execute(delete(User))
+    token_cache.clear()
+    client.cookies.clear()
+
+
+@pytest.fixture
+def make_user(password_hash):
+    """Create a user, returning its id and the headers of a valid access token"""
+    def make_user(email: str = "user@example.com", name: str = "Test User"):
+        with engine.begin() as conn:
+            user_id = conn.execute(
+                insert(User).values(email=email, name=name, password=password_hash).returning(User.id)
+            ).scalar_one()
+        token = create_access_token({"sub": email}, expires_delta=timedelta(minutes=30))
+        return user_id, {"Authorization": f"Bearer {token}"}
+    return make_user
+
+
+@pytest.fixture
+def add_posts():
+    """Insert posts for a user directly, bypassing the ORM and its cache invalidation"""
+    def add_posts(user_id: int, count: int, **values):
+        with engine.begin() as conn:
+            conn.execute(insert(Post).values(**values), [
+                {"user_id": user_id, "title": f"Post {i}", "content": f"Content of post {i}"}
+                for i in range(count)
+            ])
+    return add_posts
@@ -0,0 +1,37 @@
+from sqlalchemy import literal_column, select
+
+from database import engine
+from models import Post
+
+
+def read_all_pages(client, headers, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/users/me/posts", params=params, headers=headers)
+        assert response.status_code == 200
+        pages.append([post["id"] for post in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        # A cursor that doesn't move forward would page forever
+        if cursor is None or len(pages) > 10:
+            return pages
+
+
+def test_pages_posts_sharing_a_timestamp(client, make_user, add_posts):
+    user_id, headers = make_user()
+    # Written the way the created_at server default stores them on SQLite
+    add_posts(user_id, 7, created_at=literal_column("'2024-01-01 12:00:00'"))
+    with engine.connect() as conn:
+        ids = conn.execute(select(Post.id).where(Post.user_id == user_id).order_by(Post.id)).scalars().all()
+
+    assert read_all_pages(client, headers, limit=3) == [ids[0:3], ids[3:6], ids[6:]]
+
+
+def test_pages_newest_first(client, make_user, add_posts):
+    user_id, headers = make_user()
+    add_posts(user_id, 2, created_at=literal_column("'2024-01-01 12:00:00'"))
+    add_posts(user_id, 2, created_at=literal_column("'2024-01-02 12:00:00'"))
+    with engine.connect() as conn:
+        ids = conn.execute(select(Post.id).where(Post.user_id == user_id).order_by(Post.id)).scalars().all()
+
+    assert read_all_pages(client, headers, limit=3) == [[ids[2], ids[3], ids[0]], [ids[1]]]
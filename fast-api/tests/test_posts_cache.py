@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from database import SessionLocal
+from models import CHANGED_POSTS_KEY, Post
+from posts_cache import InMemoryHashStore, LocalPostsCache, SharedPostsCache
+from query_stats import count_queries
+
+POSTS = [{"id": 1, "user_id": 1, "title": "Post", "excerpt": "Content"}]
+
+
+@pytest.fixture(params=["local", "shared"])
+def cache(request):
+    if request.param == "local":
+        return LocalPostsCache(max_bytes=1 << 20, max_entry_bytes=1 << 10, ttl=60)
+    return SharedPostsCache(InMemoryHashStore(), max_entry_bytes=1 << 10, ttl=60)
+
+
+def test_variants_are_invalidated_together(cache):
+    async def run():
+        await cache.set(1, POSTS)
+        await cache.set(1, POSTS[:0], variant="page:10")
+        await cache.set(2, POSTS)
+        assert await cache.get(1) == POSTS
+        assert await cache.get(1, variant="page:10") == []
+
+        cache.invalidate(1)
+        assert await cache.get(1) is None
+        assert await cache.get(1, variant="page:10") is None
+        assert await cache.get(2) == POSTS
+
+    asyncio.run(run())
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 2
+
+
+def test_large_entries_are_not_cached(cache):
+    async def run():
+        await cache.set(1, [{**POSTS[0], "excerpt": "x" * 2048}])
+        return await cache.get(1)
+
+    assert asyncio.run(run()) is None
+
+
+def test_shared_entries_expire():
+    cache = SharedPostsCache(InMemoryHashStore(), max_entry_bytes=1 << 10, ttl=0)
+
+    async def run():
+        await cache.set(1, POSTS)
+        return await cache.get(1)
+
+    assert asyncio.run(run()) is None
+
+
+def test_orm_writes_invalidate_on_commit(client, make_user, add_posts):
+    user_id, headers = make_user()
+    add_posts(user_id, 1)
+    assert len(client.get("/users/me/posts", headers=headers).json()) == 1
+
+    with SessionLocal() as db:
+        db.add(Post(user_id=user_id, title="Rolled back", content="Rolled back"))
+        db.flush()
+        db.rollback()
+        assert CHANGED_POSTS_KEY not in db.info
+        with count_queries() as stats:
+            assert len(client.get("/users/me/posts", headers=headers).json()) == 1
+        assert stats.count == 0
+
+        db.add(Post(user_id=user_id, title="Committed", content="Committed"))
+        db.commit()
+    assert len(client.get("/users/me/posts", headers=headers).json()) == 2
@@ -0,0 +1,84 @@
+"""
+Statements per request of the read endpoints
+
+The suite runs with DATABASE_REPEATED_QUERY_MODE=raise, so an N+1 query
+fails the request on top of blowing the budget.
+"""
+
+import pytest
+from sqlalchemy import select
+
+from database import engine
+from models import User
+from query_stats import RepeatedQueryError, count_queries
+
+
+# Requests after the first one of a token find the user in the token cache, the
+# budgets below are for what the endpoints themselves run.
+def get(client, path, headers, **params):
+    with count_queries() as stats:
+        response = client.get(path, params=params, headers=headers)
+    assert response.status_code in (200, 304), response.text
+    return response, stats.count
+
+
+def test_users_me(client, make_user):
+    _, headers = make_user()
+
+    # The user is looked up once, then served from the token cache
+    assert get(client, "/users/me", headers)[1] == 1
+    assert get(client, "/users/me", headers)[1] == 0
+
+
+def test_users_me_posts(client, make_user, add_posts):
+    user_id, headers = make_user()
+    add_posts(user_id, 60)
+    client.get("/users/me", headers=headers)
+
+    # The posts version and one page, whatever the number of posts
+    response, count = get(client, "/users/me/posts", headers, limit=50)
+    assert len(response.json()) == 50
+    assert count == 2
+
+    _, count = get(client, "/users/me/posts", headers, limit=50, cursor=response.headers["X-Next-Cursor"])
+    assert count == 1
+
+    # Cached pages and conditional requests don't touch the database
+    response, count = get(client, "/users/me/posts", headers, limit=50)
+    assert count == 0
+    response, count = get(client, "/users/me/posts", {**headers, "If-None-Match": response.headers["ETag"]}, limit=50)
+    assert response.status_code == 304
+    assert count == 0
+
+
+def test_search(client, make_user, add_posts):
+    user_id, headers = make_user()
+    add_posts(user_id, 30)
+    client.get("/users/me", headers=headers)
+
+    response, count = get(client, "/posts/search", headers, q="content post")
+    assert len(response.json()) == 20
+    assert count == 1
+
+
+def test_random(client, make_user, add_posts):
+    for i in range(5):
+        user_id, headers = make_user(f"user{i}@example.com")
+        add_posts(user_id, 10)
+
+    client.get("/users/me", headers=headers)
+
+    assert get(client, "/random", headers)[1] <= 3
+    # With the id index loaded, at most the user and their posts
+    assert get(client, "/random", headers)[1] <= 2
+
+
+def test_repeated_statement_raises(client, make_user):
+    user_id, _ = make_user()
+    with engine.connect() as conn, count_queries():
+        with pytest.raises(RepeatedQueryError):
+            for _ in range(10):
+                conn.execute(select(User).where(User.id == user_id))
+        # The statement never ran, so nothing is left to time
+        assert conn.info.get("metrics_query_start") == []
+        assert conn.info.get("query_stats_start") == []
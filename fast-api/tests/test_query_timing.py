@@ -0,0 +1,17 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from database import engine
+
+
+def test_failed_statements_leave_no_start_times(client):
+    with engine.connect() as conn:
+        for _ in range(5):
+            with pytest.raises(DBAPIError):
+                conn.execute(text("SELECT * FROM missing_table"))
+            conn.rollback()
+        conn.execute(text("SELECT 1"))
+
+        assert conn.info.get("metrics_query_start") == []
+        assert conn.info.get("query_stats_start") == []
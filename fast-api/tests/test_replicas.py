@@ -0,0 +1,89 @@
+"""
+Read replica routing, with a copy of the SQLite test database as the replica
+
+The copy is only refreshed when a test calls sync, so anything written after
+that is missing from the replica, like on a lagging one.
+"""
+
+import shutil
+
+import pytest
+
+import database
+from database import STICKY_COOKIE, Replica, SessionLocal, engine
+from models import Post
+from token_cache import token_cache
+
+
+class CopiedReplica:
+    def __init__(self, path):
+        self.path = path
+        self.replica = Replica("replica0", f"sqlite:///{path}")
+
+    def sync(self):
+        self.dispose()
+        shutil.copy(engine.url.database, self.path)
+
+    def dispose(self):
+        replica_engine = self.replica.engine
+        getattr(replica_engine, "sync_engine", replica_engine).dispose()
+
+
+@pytest.fixture
+def replica(monkeypatch, tmp_path):
+    if engine.dialect.name != "sqlite":
+        pytest.skip("replicas are simulated with copies of the SQLite database")
+    copied = CopiedReplica(tmp_path / "replica.db")
+    copied.sync()
+    monkeypatch.setattr(database, "replicas", [copied.replica])
+    yield copied
+    copied.dispose()
+
+
+def test_reads_go_to_the_replica(client, make_user, replica):
+    _, headers = make_user()
+    assert client.get("/users/me", headers=headers).status_code == 401
+
+    replica.sync()
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+
+def test_writes_stick_to_the_primary(client, replica):
+    response = client.post("/signup", json={"email": "new@example.com", "name": "New", "password": "password123"})
+    assert response.status_code == 200
+    assert STICKY_COOKIE in response.cookies
+
+    token = client.post("/token", data={"username": "new@example.com", "password": "password123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    # Without the cookie the lagging replica doesn't know the user yet
+    client.cookies.clear()
+    token_cache.clear()
+    assert client.get("/users/me", headers=headers).status_code == 401
+
+
+def test_posts_cache_is_filled_from_the_primary(client, make_user, add_posts, replica):
+    user_id, headers = make_user()
+    add_posts(user_id, 1)
+    replica.sync()
+    assert len(client.get("/users/me/posts", headers=headers).json()) == 1
+
+    # A stale page from the replica would be cached until the next write
+    with SessionLocal() as db:
+        db.add(Post(user_id=user_id, title="Second", content="Second post"))
+        db.commit()
+    assert len(client.get("/users/me/posts", headers=headers).json()) == 2
+    assert len(client.get("/users/me/posts", headers=headers).json()) == 2
+
+
+def test_failing_replica_is_ejected(client, make_user, replica):
+    _, headers = make_user()
+    replica.dispose()
+    replica.path.unlink()
+    replica.path.mkdir()
+
+    with pytest.raises(Exception):
+        client.get("/users/me", headers=headers)
+    assert not replica.replica.healthy
+    assert client.get("/users/me", headers=headers).status_code == 200
@@ -0,0 +1,69 @@
+from sqlalchemy import update
+
+from database import SessionLocal
+from models import User
+from query_stats import count_queries
+from token_cache import CHANGED_EMAILS_KEY, token_cache
+
+
+def test_user_update_invalidates_cached_token(client, make_user):
+    user_id, headers = make_user()
+    assert client.get("/users/me", headers=headers).json()["name"] == "Test User"
+
+    with SessionLocal() as db:
+        db.get(User, user_id).name = "Renamed"
+        db.commit()
+
+    assert client.get("/users/me", headers=headers).json()["name"] == "Renamed"
+
+
+def test_requests_before_the_commit_dont_cache_the_old_row(client, make_user):
+    user_id, headers = make_user()
+    client.get("/users/me", headers=headers)
+
+    with SessionLocal() as db:
+        db.get(User, user_id).name = "Renamed"
+        db.flush()
+        assert client.get("/users/me", headers=headers).json()["name"] == "Test User"
+        db.commit()
+
+    assert client.get("/users/me", headers=headers).json()["name"] == "Renamed"
+
+
+def test_rolled_back_updates_keep_the_cached_token(client, make_user):
+    user_id, headers = make_user()
+    client.get("/users/me", headers=headers)
+
+    with SessionLocal() as db:
+        db.get(User, user_id).name = "Renamed"
+        db.flush()
+        db.rollback()
+        assert CHANGED_EMAILS_KEY not in db.info
+
+    with count_queries() as stats:
+        assert client.get("/users/me", headers=headers).json()["name"] == "Test User"
+    assert stats.count == 0
+
+
+def test_email_change_revokes_cached_token(client, make_user):
+    user_id, headers = make_user()
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    with SessionLocal() as db:
+        db.get(User, user_id).email = "changed@example.com"
+        db.commit()
+
+    assert client.get("/users/me", headers=headers).status_code == 401
+
+
+def test_writes_outside_the_orm_wait_for_the_ttl(client, make_user):
+    user_id, headers = make_user()
+    client.get("/users/me", headers=headers)
+
+    with SessionLocal() as db:
+        db.execute(update(User).where(User.id == user_id).values(name="Renamed"), execution_options={"synchronize_session": False})
+        db.commit()
+
+    assert client.get("/users/me", headers=headers).json()["name"] == "Test User"
+    token_cache.clear()
+    assert client.get("/users/me", headers=headers).json()["name"] == "Renamed"
@@ -0,0 +1,104 @@
+"""
+Cache of verified access tokens and the user they belong to
+
+Lets get_current_user skip the JWT signature check and the user lookup for
+tokens it has already seen. Entries never outlive the token's ``exp`` claim
+and are dropped when a transaction updating or deleting the user row
+commits in this process.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from cache import LRUCache
+from config import settings
+from models import User
+
+# Session.info key collecting the emails of the users changed in a transaction
+CHANGED_EMAILS_KEY = "token_cache_changed_emails"
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Detached snapshot of the columns handlers read from the current user"""
+    id: int
+    name: str
+    email: str
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id,
+            name=user.name,
+            email=user.email,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+
+class TokenCache:
+    """
+    Maps raw tokens to user snapshots.
+
+    Invalidation bumps a per-email generation instead of hunting down every
+    token of the user; entries from an older generation are treated as misses.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = LRUCache(maxsize, ttl)
+        self._generations: Dict[str, int] = {}
+
+    def get(self, token: str) -> Optional[CachedUser]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+
+        user, generation = entry
+        if generation != self._generations.get(user.email, 0):
+            self._entries.pop(token)
+            return None
+        return user
+
+    def set(self, token: str, expires_at: Optional[float], user: CachedUser):
+        self._entries.set(token, (user, self._generations.get(user.email, 0)), expires_at=expires_at)
+
+    def invalidate_user(self, email: str):
+        self._generations[email] = self._generations.get(email, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+
+
+token_cache = TokenCache(settings.token_cache_size, settings.token_cache_ttl_seconds)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _record_changed_user(mapper, connection, target):
+    history = inspect(target).attrs.email.history
+    emails = {target.email, *history.deleted}
+    session = object_session(target)
+    if session is None:
+        for email in emails:
+            token_cache.invalidate_user(email)
+        return
+    session.info.setdefault(CHANGED_EMAILS_KEY, set()).update(emails)
+
+
+# Invalidating at flush time would let a request between the flush and the
+# commit cache the old row again, under the new generation
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for email in session.info.pop(CHANGED_EMAILS_KEY, ()):
+        token_cache.invalidate_user(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop(CHANGED_EMAILS_KEY, None)
@@ -0,0 +1,92 @@
+"""
+Cached index of user ids used to pick random users without scanning the users table
+"""
+
+import asyncio
+import random
+import time
+from array import array
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from models import User
+
+
+def _load_ids(session) -> array:
+    return array("q", session.connection().execute(select(User.id)).scalars())
+
+
+class UserIdIndex:
+    """
+    Keeps every user id in a compact array and refreshes it periodically.
+
+    Picking a user is a uniform choice over the array followed by a primary
+    key lookup, so the cost per request does not depend on the table size.
+    Ids that disappeared since the last refresh trigger a rebuild and a retry.
+    Used from the event loop only, with the request's session.
+    """
+
+    def __init__(self, refresh_seconds: float, max_attempts: int = 3):
+        self.refresh_seconds = refresh_seconds
+        self.max_attempts = max_attempts
+        self._ids = array("q")
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    async def refresh(self, db, seen_loaded_at: Optional[float]):
+        """
+        Rebuild the index from the users table, unless it was rebuilt since
+        the caller saw it loaded at seen_loaded_at: callers that waited for a
+        running rebuild use its result instead of starting another one.
+        """
+        async with self._refresh_lock:
+            if self._loaded_at != seen_loaded_at:
+                return
+            if isinstance(db, AsyncSession):
+                result = await db.execute(select(User.id))
+                # Copying a million ids takes a while, keep it off the event loop
+                self._ids = await run_in_threadpool(array, "q", result.scalars())
+            else:
+                # The sync session runs the whole load in the threadpool
+                self._ids = await db.run_sync(_load_ids)
+            self._loaded_at = time.monotonic()
+
+    def add(self, user_id: int):
+        """Register a freshly created user so it can be picked before the next refresh"""
+        if self._loaded_at is not None:
+            self._ids.append(user_id)
+
+    async def pick(self, db) -> Optional[User]:
+        """Return a uniformly chosen user, or None if there are no users"""
+        if not self._ids:
+            await self.refresh(db, self._loaded_at)
+        elif self.is_stale() and not self._refresh_lock.locked():
+            # Only one caller rebuilds a stale index, the others keep using the old snapshot
+            await self.refresh(db, self._loaded_at)
+
+        for _ in range(self.max_attempts):
+            ids = self._ids
+            if not ids:
+                return None
+
+            loaded_at = self._loaded_at
+            user = await db.get(User, random.choice(ids))
+            if user is not None:
+                return user
+
+            # The id was deleted since the last refresh, rebuild and try again
+            await self.refresh(db, loaded_at)
+
+        return None
+
+
+user_id_index = UserIdIndex(refresh_seconds=settings.random_user_index_refresh_seconds)